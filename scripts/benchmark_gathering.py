@@ -0,0 +1,169 @@
+#
+# Gathering Benchmark
+#
+# Runs rest_gathering.py and gather_profile.py against mock_twitter_api.py, started in this process, and reports
+# their throughput in tweets/s as JSON, with as many bearer tokens and as tight rate limits as asked for. A REST
+# gathering run is also killed midway and resumed with --resume, to check that the output stays valid JSON after the
+# kill and ends up the same as an uninterrupted run.
+#
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+# the repository root has to be importable before 'scripts'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.mock_twitter_api import DEFAULT_LIMITS, make_server
+
+SCRIPTS = os.path.abspath(os.path.dirname(__file__))
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmarks the gathering scripts against a local mock API.')
+    parser.add_argument('-s', '--start_time', metavar='', default='2023-05-01T00:00Z',
+                        help='"YYYY-MM-DDTHH:mmZ" UTC. Default is 2023-05-01T00:00Z')
+    parser.add_argument('-u', '--end_time', metavar='', default='2023-05-08T00:00Z',
+                        help='"YYYY-MM-DDTHH:mmZ" UTC. Default is 2023-05-08T00:00Z')
+    parser.add_argument('-m', '--maxtweets', metavar='', type=int, default=5000,
+                        help='Tweets collected by each REST run. Default is 5000')
+    parser.add_argument('-p', '--slices', metavar='', type=int, action='append', default=None,
+                        help='--slices of a REST run, repeatable. Default is 1 and 4')
+    parser.add_argument('-v', '--volume', metavar='', type=int, default=1000,
+                        help='Average tweets per hour in the mock archive. Default is 1000')
+    parser.add_argument('-l', '--latency', metavar='', type=float, default=0.2,
+                        help='Mean seconds the mock adds to each response. Default is 0.2')
+    parser.add_argument('-e', '--errorrate', metavar='', type=float, default=0.0,
+                        help='Fraction of mock responses that are 503 errors. Default is 0')
+    parser.add_argument('-k', '--keys', metavar='', type=int, default=1,
+                        help='Bearer tokens given to the gatherers. Default is 1')
+    parser.add_argument('-w', '--window', metavar='', type=int, default=900,
+                        help='Rate-limit window of the mock in seconds. Default is 900')
+    parser.add_argument('-L', '--limit', metavar='', action='append', default=[],
+                        help='ENDPOINT=REQUESTS per token and window of the mock, repeatable. Defaults: %s'
+                             % ', '.join('%s=%i' % item for item in DEFAULT_LIMITS.items()))
+    parser.add_argument('-U', '--user', metavar='', default='tweetutils',
+                        help='Profile gathered by gather_profile.py. Default is tweetutils')
+    parser.add_argument('-o', '--outfile', metavar='', default=None, help='Write the JSON report here too')
+    return parser.parse_args()
+
+
+def run_script(script, arguments, api_url, keys_file):
+    command = [sys.executable, os.path.join(SCRIPTS, script)] + arguments + ['--api', api_url, '--keys', keys_file]
+    return subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def timed_run(server, script, arguments, outfile, api_url, keys_file) -> dict:
+    requests_before = server.stats['requests']
+    start = time.perf_counter()
+    returncode = run_script(script, arguments, api_url, keys_file).wait()
+    seconds = time.perf_counter() - start
+
+    with open(outfile, 'r', encoding='utf8') as f:
+        tweets = len(json.load(f))
+    return {'returncode': returncode, 'tweets': tweets, 'seconds': seconds, 'tweets_per_s': tweets / seconds,
+            'requests': server.stats['requests'] - requests_before}
+
+
+def resume_check(server, arguments, outfile, reference, api_url, keys_file) -> dict:
+    """
+    Kills a REST run once a third of its tweets are checkpointed, then resumes it.
+    """
+    checkpoint = outfile + '.checkpoint'
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    requests_before = server.stats['requests']
+    process = run_script('rest_gathering.py', arguments, api_url, keys_file)
+    checkpointed = 0
+    while process.poll() is None and checkpointed < reference / 3:
+        time.sleep(0.05)
+        try:
+            with open(checkpoint, 'r', encoding='utf8') as f:
+                checkpointed = json.load(f)['tweets']
+        except (OSError, ValueError):
+            pass
+    process.kill()
+    process.wait()
+
+    try:
+        with open(outfile, 'r', encoding='utf8') as f:
+            killed_tweets = len(json.load(f))
+        valid = True
+    except ValueError:
+        killed_tweets = None
+        valid = False
+
+    returncode = run_script('rest_gathering.py', arguments + ['--resume'], api_url, keys_file).wait()
+    with open(outfile, 'r', encoding='utf8') as f:
+        tweets = json.load(f)
+    return {'returncode': returncode, 'killed_after': checkpointed, 'valid_after_kill': valid,
+            'tweets_after_kill': killed_tweets, 'tweets': len(tweets),
+            'requests': server.stats['requests'] - requests_before}, tweets
+
+
+def benchmark(args, limits) -> dict:
+    server = make_server(0, volume=args.volume, window=args.window, limits=limits, latency=args.latency,
+                         error_rate=args.errorrate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = 'http://127.0.0.1:%i' % server.server_address[1]
+
+    report = {'mock': {'volume': args.volume, 'latency': args.latency, 'error_rate': args.errorrate,
+                       'window': args.window, 'limits': dict(DEFAULT_LIMITS, **limits), 'keys': args.keys},
+              'rest_gathering': [], 'gather_profile': None, 'resume': None}
+    with tempfile.TemporaryDirectory() as directory:
+        keys_file = os.path.join(directory, 'keys.txt')
+        with open(keys_file, 'w') as f:
+            f.write(''.join('benchmark-token-%i\n' % index for index in range(args.keys)))
+
+        outfile = os.path.join(directory, 'output.json')
+        base = ['-q', 'benchmark', '-l', 'pt', '-s', args.start_time, '-u', args.end_time,
+                '-m', str(args.maxtweets), '-o', outfile]
+        reference = None
+        for slices in args.slices or [1, 4]:
+            result = timed_run(server, 'rest_gathering.py', base + ['--slices', str(slices)], outfile, api_url,
+                               keys_file)
+            report['rest_gathering'].append(dict(result, slices=slices))
+            if slices == 1:
+                with open(outfile, 'r', encoding='utf8') as f:
+                    reference = json.load(f)
+
+        if reference is not None:
+            resume, tweets = resume_check(server, base, outfile, len(reference), api_url, keys_file)
+            report['resume'] = dict(resume, identical=tweets == reference)
+
+        profile_outfile = os.path.join(directory, 'output_profile.json')
+        report['gather_profile'] = timed_run(server, 'gather_profile.py', ['-u', args.user, '-o', profile_outfile],
+                                             profile_outfile, api_url, keys_file)
+
+    server.shutdown()
+    server.server_close()
+    report['mock']['stats'] = server.stats
+    return report
+
+
+def main() -> None:
+    args = add_args()
+    limits = {}
+    for item in args.limit:
+        endpoint, _, value = item.partition('=')
+        if endpoint not in DEFAULT_LIMITS or not value.isdigit():
+            sys.stdout.write('Invalid limit: %s\nQuitting...' % item)
+            return
+        limits[endpoint] = int(value)
+
+    report = benchmark(args, limits)
+    output = json.dumps(report, indent=2)
+    if args.outfile:
+        with open(args.outfile, 'w', encoding='utf8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#
+# Sentiment Backend Benchmark
+#
+# Cross-validates estimator combinations of SentimentClassifier on the training dataset and reports, for each one,
+# accuracy and macro F1, fit time, single-tweet latency and batch throughput as JSON. Each (combination, fold) pair
+# runs in its own worker process.
+#
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.modules.sentiment import Sentiment
+from scripts.modules.sentiment_classifier import SentimentClassifier, ESTIMATORS
+from scripts.modules.training_data import load_training_data
+
+DEFAULT_CONFIGURATIONS = ['lr,nb,svc', 'linearsvc,complementnb,linearsvc', 'sgd,nb,sgd', 'lr,complementnb,linearsvc']
+
+# dataset codes of each Sentiment
+DATASET_CODES = {Sentiment.NEUTRAL: 0, Sentiment.POSITIVE: 1, Sentiment.NEGATIVE: 2}
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmarks estimator combinations of the sentiment classifier.')
+    parser.add_argument('-d', '--dataset', metavar='', default='dataset.xlsx',
+                        help='Labelled dataset. Default is dataset.xlsx')
+    parser.add_argument('-c', '--configuration', metavar='', action='append', default=None,
+                        help='Comma-separated estimators of the positive/negative, positive/neutral and '
+                             'negative/neutral classifiers. Repeat for several; default is %s. Estimators: %s'
+                             % (' '.join(DEFAULT_CONFIGURATIONS), ', '.join(ESTIMATORS)))
+    parser.add_argument('-k', '--folds', metavar='', type=int, default=5, help='Cross-validation folds. Default is 5')
+    parser.add_argument('-j', '--jobs', metavar='', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes. Default is the number of CPUs')
+    parser.add_argument('-l', '--latencysamples', metavar='', type=int, default=200,
+                        help='Single-tweet predictions timed per fold. Default is 200')
+    parser.add_argument('-o', '--outfile', metavar='', default=None, help='Write the JSON report here too')
+    return parser.parse_args()
+
+
+def run_fold(dataset, backends, test, latency_samples) -> dict:
+    texts, labels = load_training_data(dataset)
+    train = np.ones(len(texts), dtype=bool)
+    train[test] = False
+
+    classifier = SentimentClassifier(dataset, backends=backends, training_jobs=1, load=False)
+    start = time.perf_counter()
+    classifier.train_sentiment_classifiers(texts[train], labels[train])
+    fit_seconds = time.perf_counter() - start
+
+    # the first pass also warms the stem cache, so the timings below are steady-state ones
+    test_texts = texts[test].tolist()
+    predicted = np.array([DATASET_CODES[sentiment] for sentiment in classifier.predict_batch(test_texts)])
+
+    latencies = []
+    for text in test_texts[:latency_samples]:
+        start = time.perf_counter()
+        classifier.predict(text)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    classifier.predict_batch(test_texts)
+    batch_seconds = time.perf_counter() - start
+
+    return {'accuracy': float(accuracy_score(labels[test], predicted)),
+            'f1_macro': float(f1_score(labels[test], predicted, average='macro')),
+            'fit_seconds': fit_seconds,
+            'fit_seconds_per_model': classifier.fit_times,
+            'latency_ms': float(np.median(latencies) * 1000),
+            'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'throughput': len(test_texts) / batch_seconds}
+
+
+def summarize(backends, folds) -> dict:
+    def stats(values):
+        return {'mean': float(np.mean(values)), 'std': float(np.std(values))}
+
+    return {'backends': list(backends),
+            'accuracy': stats([fold['accuracy'] for fold in folds]),
+            'f1_macro': stats([fold['f1_macro'] for fold in folds]),
+            'fit_seconds': stats([fold['fit_seconds'] for fold in folds]),
+            'fit_seconds_per_model': {name: float(np.mean([fold['fit_seconds_per_model'][name] for fold in folds]))
+                                      for name in folds[0]['fit_seconds_per_model']},
+            'latency_ms': {'median': float(np.median([fold['latency_ms'] for fold in folds])),
+                           'p95': float(np.max([fold['latency_p95_ms'] for fold in folds]))},
+            'throughput_tweets_per_s': stats([fold['throughput'] for fold in folds])}
+
+
+def benchmark(dataset, configurations, k=5, jobs=1, latency_samples=200) -> dict:
+    texts, labels = load_training_data(dataset)
+    folds = [test for _, test in StratifiedKFold(k, shuffle=True, random_state=0).split(texts, labels)]
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(max(jobs, 1), mp_context=context) as pool:
+        futures = {backends: [pool.submit(run_fold, dataset, backends, test, latency_samples) for test in folds]
+                   for backends in configurations}
+        results = [summarize(backends, [future.result() for future in pending])
+                   for backends, pending in futures.items()]
+
+    return {'dataset': dataset, 'tweets': len(texts), 'folds': k, 'configurations': results}
+
+
+def main() -> None:
+    args = add_args()
+    configurations = [tuple(configuration.split(',')) for configuration in args.configuration or DEFAULT_CONFIGURATIONS]
+    for backends in configurations:
+        if len(backends) != 3 or any(name not in ESTIMATORS for name in backends):
+            sys.stdout.write('Invalid configuration: %s\nQuitting...' % ','.join(backends))
+            return
+
+    report = benchmark(args.dataset, configurations, args.folds, args.jobs, args.latencysamples)
+    output = json.dumps(report, indent=2)
+    if args.outfile:
+        with open(args.outfile, 'w', encoding='utf8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#
+# Compact Sentiment Model Export
+#
+# Converts the fitted SentimentClassifier into the NumPy bundle read by CompactSentimentModel
+# (sentiment_analysis.py -c), then checks that both give the same labels and that predicting with the bundle, words
+# missing from its stem cache included, never imports scikit-learn, pandas or nltk.
+#
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.modules.compact_model import COMPACT_MODEL_FILE, CompactSentimentModel, export_compact_model
+from scripts.modules.loader import Loader
+from scripts.modules.training_data import load_training_data
+
+# modules the compact predictor must not load
+HEAVY_MODULES = ['sklearn', 'pandas', 'nltk']
+
+# run in a fresh interpreter, as this one has already imported scikit-learn
+ISOLATION_CHECK = """
+import sys, json
+sys.path.append(sys.argv[1])
+from scripts.modules.compact_model import CompactSentimentModel
+CompactSentimentModel(sys.argv[2]).predict_batch(['zzqxunseenword hello', 'gathering unstemmed runnings'])
+print(json.dumps([name for name in json.loads(sys.argv[3]) if name in sys.modules]))
+"""
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Exports the sentiment classifier to a NumPy-only bundle.')
+    parser.add_argument('-o', '--outfile', metavar='', default=COMPACT_MODEL_FILE,
+                        help='Bundle to write. Default is DATA/models/sentiment_compact.npz')
+    parser.add_argument('-d', '--dtype', metavar='', default='float32', choices=['float32', 'float64'],
+                        help='Type of the stored weights, float32 or float64. Default is float32')
+    parser.add_argument('-v', '--verify', metavar='', default=None,
+                        help='JSON or CSV file of tweets to compare labels on, besides the training dataset')
+    parser.add_argument('-r', '--retrain', action='store_true',
+                        help='Retrain the classifiers even if a saved model matches the training dataset')
+    return parser.parse_args()
+
+
+def verify(classifier, compact, texts, batch_size=1000) -> int:
+    mismatches = 0
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        for text, expected, found in zip(batch, classifier.predict_batch(batch), compact.predict_batch(batch)):
+            if expected != found:
+                mismatches += 1
+                print('Mismatch (%s, compact %s): %r' % (expected.name, found.name, text[:80]))
+    return mismatches
+
+
+def loaded_modules(path) -> list:
+    """
+    Returns which of HEAVY_MODULES a fresh process has imported after loading the bundle and predicting with it.
+    """
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    output = subprocess.run([sys.executable, '-c', ISOLATION_CHECK, root, path, json.dumps(HEAVY_MODULES)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    args = add_args()
+
+    from scripts.modules.sentiment_classifier import SentimentClassifier
+
+    print('Loading model...')
+    classifier = SentimentClassifier(retrain=args.retrain)
+    path = export_compact_model(classifier, args.outfile, args.dtype)
+    print('Compact model written to %s (%.1f KB)' % (path, os.path.getsize(path) / 1024))
+
+    texts = load_training_data(classifier.dataset)[0].tolist()
+    if args.verify:
+        texts += [str(tweet['text']) for tweet in Loader().stream_file(args.verify)]
+
+    compact = CompactSentimentModel(path)
+    mismatches = verify(classifier, compact, texts)
+    print('Verified %i texts: %i label mismatches' % (len(texts), mismatches))
+
+    loaded = loaded_modules(path)
+    if loaded:
+        print('Compact inference imported %s\nQuitting...' % ', '.join(loaded))
+        sys.exit(1)
+    print('Compact inference imports none of %s' % ', '.join(HEAVY_MODULES))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,59 +2,68 @@ import os
 import sys
 import tweepy
 import argparse
-import json
 
-def getkey():
-    p = os.path.abspath(os.path.join(os.path.dirname( __file__ ), '..', 'DATA', 'keys.txt'))
-    arq = open(p, 'r')
-    chave = arq.read().splitlines()[0]
-    arq.close()
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-    return chave
+from scripts.modules.credentials import CredentialPool, mount_pool
+from scripts.modules.progress import CollectedCounter
+from scripts.modules.twitter_api import KEYS_FILE, default_api_url
+from scripts.modules.writer import open_writer, writer_class
 
 
 def add_args():
     parser = argparse.ArgumentParser(description='Coleta tweets de acordo com a query, data e limites.')
     parser.add_argument('-u', '--user', metavar='', required=True)
-    parser.add_argument('-o', '--outfile', metavar='', default="output_profile.json")
+    parser.add_argument('-o', '--outfile', metavar='', default="output_profile.json",
+                        help='JSON array by default; .jsonl, .jsonl.gz, .db and .sqlite write JSON Lines, gzipped '
+                             'JSON Lines or an SQLite table instead')
+    parser.add_argument('-k', '--keys', metavar='', default=KEYS_FILE,
+                        help='File with one bearer token per line; requests are spread over all of them. '
+                             'Default is DATA/keys.txt')
+    parser.add_argument('-a', '--api', metavar='', default=default_api_url(),
+                        help='Base URL of the API, e.g. http://127.0.0.1:8770 for mock_twitter_api.py. Default is '
+                             'the Twitter API, or $TWITTER_API_URL when set')
     return parser.parse_args()
 
 
+def page_lines(tweets) -> list:
+    lines = []
+    for tweet in tweets or []:
+        lines.append({'id': tweet.id, 'text': tweet.text, 'created_at': tweet.created_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                      'lang': tweet.lang, 'author_id': tweet.author_id,
+                      'retweet_count': tweet.public_metrics['retweet_count']})
+    return lines
+
+
 def main():
     args = add_args()
-    arq = open(args.outfile, 'w')
-    client = tweepy.Client(bearer_token=getkey(), wait_on_rate_limit=True)
+    try:
+        writer_class(args.outfile)
+    except ValueError as error:
+        sys.stdout.write('%s\nQuitting...' % error)
+        return
+
+    pool = CredentialPool.from_file(args.keys)
+    client = tweepy.Client(bearer_token=pool.keys[0], wait_on_rate_limit=True)
+    mount_pool(client.session, pool, args.api)
 
     if not args.user.isdigit():
         args.user = client.get_user(username=args.user)
         args.user = args.user.data['id']
 
-    arq.write("[\n")
-    counter = 1
-
-    for tweet in tweepy.Paginator(client.get_users_tweets, args.user, max_results=100, tweet_fields=['created_at', 'lang', 'public_metrics', 'author_id']).flatten():
-        id = tweet.id
-        text = tweet.text
-        created_at = tweet.created_at
-        lang = tweet.lang
-        author_id = tweet.author_id
-        rt_count = tweet.public_metrics['retweet_count']
-        line = {'id' : id, 'text' : text, 'created_at' : created_at, 'lang' : lang, 'author_id' : author_id, 'retweet_count' : rt_count}
-        line['created_at'] = line['created_at'].strftime('%Y-%m-%dT%H:%M:%SZ')
-        
-        if counter == 1:
-            arq.write(json.dumps(line)+'\n')
-
-        else:
-            arq.write(','+json.dumps(line)+'\n')
-
-        sys.stdout.write("\rNumber of tweets collected so far...: %i"%counter)
-        sys.stdout.flush()
-        counter += 1
-
-    arq.write("]")
-    arq.close()
+    # each page of the timeline is written as one block; nothing resumes a profile, so only close() syncs the output
+    counter = CollectedCounter()
+    with open_writer(args.outfile, sort_keys=False, ensure_ascii=True) as writer:
+        for response in tweepy.Paginator(client.get_users_tweets, args.user, max_results=100,
+                                         tweet_fields=['created_at', 'lang', 'public_metrics', 'author_id']):
+            lines = page_lines(response.data)
+            writer.write_many(lines)
+            counter.add(len(lines))
+
+    counter.finish()
     sys.stdout.write('\nAll done! Finishing...')
 
+
 if __name__== "__main__":
-    main()
\ No newline at end of file
+    main()
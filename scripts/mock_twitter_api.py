@@ -0,0 +1,422 @@
+#
+# Mock Twitter API Server
+#
+# Serves the v2 routes used by rest_gathering.py and gather_profile.py (search/all, counts/all, users/:id/tweets and
+# users/by) from a synthetic, deterministic archive, so both can be tested and benchmarked offline. Responses carry
+# rate-limit headers and answer 429 once a bearer token spends its window; latency and server errors can be added.
+# Point the gatherers at it with --api http://127.0.0.1:<port> or the TWITTER_API_URL variable.
+#
+
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Twitter ids carry their creation time in milliseconds since this epoch, shifted past 22 bits of sequence
+TWITTER_EPOCH_MS = 1288834974657
+HOUR_MS = 3600 * 1000
+
+GRANULARITY_MS = {'minute': 60 * 1000, 'hour': HOUR_MS, 'day': 24 * HOUR_MS}
+
+# buckets per counts/all page, about 31 days of each granularity like the real endpoint
+COUNTS_PAGE = {'minute': 1440, 'hour': 744, 'day': 31}
+
+# requests per bearer token and window of each endpoint, as in the Academic Research track
+DEFAULT_LIMITS = {'search': 300, 'counts': 300, 'timeline': 1500, 'users': 900}
+
+WORDS = {
+    'pt': ['hoje', 'o', 'jogo', 'foi', 'muito', 'bom', 'ruim', 'ótimo', 'péssimo', 'governo', 'eleição', 'chuva',
+           'feliz', 'triste', 'amo', 'odeio', 'esse', 'novo', 'filme', 'show', 'trânsito', 'notícia', 'verdade'],
+    'en': ['today', 'the', 'game', 'was', 'really', 'good', 'bad', 'great', 'awful', 'government', 'election',
+           'rain', 'happy', 'sad', 'love', 'hate', 'this', 'new', 'movie', 'show', 'traffic', 'news', 'true'],
+}
+PEOPLE = ['Lula', 'Bolsonaro', 'Neymar', 'Anitta', 'Marta', 'Pelé', 'Biden', 'Messi']
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serves a synthetic Twitter v2 API over localhost HTTP.')
+    parser.add_argument('-p', '--port', metavar='', type=int, default=8770,
+                        help='Port to listen on (localhost only). Default is 8770')
+    parser.add_argument('-v', '--volume', metavar='', type=int, default=1000,
+                        help='Average tweets per hour in the archive. Default is 1000')
+    parser.add_argument('-t', '--timeline', metavar='', type=int, default=3200,
+                        help='Tweets in each user timeline. Default is 3200')
+    parser.add_argument('-w', '--window', metavar='', type=int, default=900,
+                        help='Rate-limit window in seconds. Default is 900')
+    parser.add_argument('-L', '--limit', metavar='', action='append', default=[],
+                        help='ENDPOINT=REQUESTS per token and window, repeatable. Endpoints and defaults: %s'
+                             % ', '.join('%s=%i' % item for item in DEFAULT_LIMITS.items()))
+    parser.add_argument('-l', '--latency', metavar='', type=float, default=0.0,
+                        help='Mean seconds added to each response. Default is 0')
+    parser.add_argument('-j', '--jitter', metavar='', type=float, default=0.0,
+                        help='Standard deviation of the added latency in seconds. Default is 0')
+    parser.add_argument('-e', '--errorrate', metavar='', type=float, default=0.0,
+                        help='Fraction of requests answered with 503 Service Unavailable. Default is 0')
+    parser.add_argument('-s', '--seed', metavar='', type=int, default=0, help='Seed of the archive. Default is 0')
+    return parser.parse_args()
+
+
+def parse_time(value) -> int:
+    """
+    Milliseconds since the Unix epoch of an ISO 8601 / RFC 3339 UTC time such as 2023-05-23T10:00:00Z.
+    """
+    moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def format_time(ms) -> str:
+    moment = datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.') + '%03iZ' % (ms % 1000)
+
+
+def snowflake(ms, sequence) -> int:
+    return ((ms - TWITTER_EPOCH_MS) << 22) | (sequence & 0x3FFFFF)
+
+
+def snowflake_time(tweet_id) -> int:
+    return (tweet_id >> 22) + TWITTER_EPOCH_MS
+
+
+def user_id(username) -> int:
+    digest = hashlib.blake2b(username.lower().encode('utf8'), digest_size=8).digest()
+    return 10 ** 6 + int.from_bytes(digest, 'big') % 10 ** 12
+
+
+class SyntheticArchive:
+    """
+    Tweets derived from their ids: the number of tweets in each hour follows a daily cycle with some noise, they are
+    spread evenly over the hour, and the content of each one is drawn from a generator seeded with its id. Any
+    slice of the archive can then be served in id order without storing it, and every request sees the same tweets.
+    """
+
+    def __init__(self, volume=1000, timeline=3200, seed=0):
+        self.volume = volume
+        self.timeline = timeline
+        self.seed = seed
+        # user timelines end at the server start, so they stay put while it runs
+        self.anchor_ms = int(time.time()) // 60 * 60 * 1000
+
+    def hour_count(self, hour) -> int:
+        noise = random.Random(hour * 1000003 + self.seed).uniform(0.7, 1.3)
+        return int(self.volume * (1 + 0.6 * math.sin(2 * math.pi * (hour % 24 - 9) / 24)) * noise)
+
+    def hour_times(self, hour) -> list:
+        count = self.hour_count(hour)
+        return [hour * HOUR_MS + k * HOUR_MS // count for k in range(count)]
+
+    def ids_between(self, start_ms, end_ms, until_id=None):
+        """
+        Yields the ids of the tweets created in [start_ms, end_ms), newest first, below until_id when given.
+        """
+        for hour in range((end_ms - 1) // HOUR_MS, start_ms // HOUR_MS - 1, -1):
+            times = self.hour_times(hour)
+            for k in range(len(times) - 1, -1, -1):
+                if start_ms <= times[k] < end_ms:
+                    tweet_id = snowflake(times[k], k)
+                    if until_id is None or tweet_id < until_id:
+                        yield tweet_id
+
+    def count_between(self, start_ms, end_ms) -> int:
+        total = 0
+        for hour in range(start_ms // HOUR_MS, (end_ms - 1) // HOUR_MS + 1):
+            if start_ms <= hour * HOUR_MS and (hour + 1) * HOUR_MS <= end_ms:
+                total += self.hour_count(hour)
+            else:
+                total += sum(1 for ms in self.hour_times(hour) if start_ms <= ms < end_ms)
+        return total
+
+    def tweet(self, tweet_id, author=None) -> dict:
+        rng = random.Random(tweet_id ^ self.seed)
+        lang = 'pt' if rng.random() < 0.6 else 'en'
+        words = [rng.choice(WORDS[lang]) for _ in range(rng.randint(5, 16))]
+        tweet = {'id': str(tweet_id),
+                 'edit_history_tweet_ids': [str(tweet_id)],
+                 'created_at': format_time(snowflake_time(tweet_id)),
+                 'lang': lang,
+                 'author_id': str(author if author is not None else 10 ** 6 + rng.randrange(5000)),
+                 'public_metrics': {'retweet_count': int(rng.paretovariate(1.5)) - 1,
+                                    'reply_count': rng.randrange(5),
+                                    'like_count': int(rng.paretovariate(1.2)) - 1,
+                                    'quote_count': rng.randrange(2)}}
+
+        entities = {}
+        if rng.random() < 0.2:
+            url = 'https://t.co/%08x' % rng.getrandbits(32)
+            words.append(url)
+            entities['urls'] = [{'start': 0, 'end': len(url), 'url': url, 'expanded_url': url, 'display_url': url}]
+        if rng.random() < 0.15:
+            person = rng.choice(PEOPLE)
+            words.insert(rng.randrange(len(words)), person)
+            entities['annotations'] = [{'start': 0, 'end': len(person) - 1, 'probability': round(rng.random(), 4),
+                                        'type': 'Person', 'normalized_text': person}]
+        if entities:
+            tweet['entities'] = entities
+        if rng.random() < 0.1:
+            tweet['attachments'] = {'media_keys': ['3_%i' % tweet_id]}
+
+        tweet['text'] = ' '.join(words)
+        return tweet
+
+    def timeline_id(self, user, index) -> int:
+        # one tweet every 1 to 12 hours, depending on the user
+        interval = (user % 12 + 1) * HOUR_MS
+        return snowflake(self.anchor_ms - index * interval, user)
+
+
+class RateLimits:
+    """
+    Fixed windows per bearer token and endpoint, opened by the first request, as the x-rate-limit-* headers describe
+    them.
+    """
+
+    def __init__(self, limits, window):
+        self.limits = limits
+        self.window = window
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def take(self, token, endpoint) -> tuple:
+        """
+        Spends a request and returns (allowed, limit, remaining, reset epoch seconds).
+        """
+        limit = self.limits[endpoint]
+        now = time.time()
+        with self.lock:
+            reset, remaining = self.windows.get((token, endpoint), (0, limit))
+            if now >= reset:
+                reset, remaining = int(now) + self.window, limit
+            allowed = remaining > 0
+            if allowed:
+                remaining -= 1
+            self.windows[(token, endpoint)] = (reset, remaining)
+        return allowed, limit, remaining, reset
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, payload, headers=None) -> None:
+        body = json.dumps(payload).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, str(value))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client went away, e.g. a gathering run killed to test --resume
+            pass
+
+    def send_problem(self, status, title, detail, headers=None) -> None:
+        self.send_json(status, {'title': title, 'detail': detail, 'type': 'about:blank', 'status': status}, headers)
+
+    def route(self, path) -> tuple:
+        parts = path.strip('/').split('/')
+        if parts == ['2', 'tweets', 'search', 'all']:
+            return 'search', self.search_all
+        if parts == ['2', 'tweets', 'counts', 'all']:
+            return 'counts', self.counts_all
+        if parts == ['2', 'users', 'by']:
+            return 'users', self.users_by
+        if len(parts) == 5 and parts[:4] == ['2', 'users', 'by', 'username']:
+            return 'users', self.users_by
+        if len(parts) == 4 and parts[:2] == ['2', 'users'] and parts[3] == 'tweets' and parts[2].isdigit():
+            return 'timeline', self.users_tweets
+        return None, None
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        server = self.server
+        if url.path == '/mock/stats':
+            with server.stats_lock:
+                self.send_json(200, dict(server.stats))
+            return
+
+        endpoint, handler = self.route(url.path)
+        if handler is None:
+            self.send_problem(404, 'Not Found Error', 'No route for %s' % url.path)
+            return
+
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or len(authorization) <= len('Bearer '):
+            self.send_problem(401, 'Unauthorized', 'Unauthorized')
+            return
+
+        if server.latency or server.jitter:
+            time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        allowed, limit, remaining, reset = server.rate_limits.take(authorization[len('Bearer '):], endpoint)
+        headers = {'x-rate-limit-limit': limit, 'x-rate-limit-remaining': remaining, 'x-rate-limit-reset': reset}
+        server.count('requests')
+        if not allowed:
+            server.count('rate_limited')
+            self.send_problem(429, 'Too Many Requests', 'Too Many Requests', headers)
+            return
+        if random.random() < server.error_rate:
+            server.count('errors')
+            self.send_problem(503, 'Service Unavailable', 'Service Unavailable', headers)
+            return
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            payload = handler(url.path, params)
+        except (KeyError, ValueError) as e:
+            self.send_problem(400, 'Invalid Request', 'One or more parameters to your request was invalid: %s' % e,
+                              headers)
+            return
+        server.count('tweets', len(payload.get('data', [])) if endpoint in ('search', 'timeline') else 0)
+        self.send_json(200, payload, headers)
+
+    def time_range(self, params) -> tuple:
+        end_ms = parse_time(params['end_time']) if 'end_time' in params else int(time.time() * 1000) - 30000
+        start_ms = parse_time(params['start_time']) if 'start_time' in params else end_ms - 30 * 24 * HOUR_MS
+        if start_ms >= end_ms:
+            raise ValueError("'start_time' must be before 'end_time'")
+        return start_ms, end_ms
+
+    def search_all(self, path, params) -> dict:
+        archive = self.server.archive
+        start_ms, end_ms = self.time_range(params)
+        max_results = int(params.get('max_results', 10))
+        if not 10 <= max_results <= 500:
+            raise ValueError("'max_results' must be between 10 and 500")
+
+        # the token holds the id to continue below; until_id narrows it further
+        bounds = [int(params['next_token'], 16)] if 'next_token' in params else []
+        if 'until_id' in params:
+            bounds.append(int(params['until_id']))
+        until_id = min(bounds) if bounds else None
+        since_id = int(params.get('since_id', 0))
+
+        ids = []
+        for tweet_id in archive.ids_between(start_ms, end_ms, until_id):
+            if tweet_id <= since_id or len(ids) > max_results:
+                break
+            ids.append(tweet_id)
+
+        more = len(ids) > max_results
+        ids = ids[:max_results]
+        if not ids:
+            return {'meta': {'result_count': 0}}
+
+        tweets = [archive.tweet(tweet_id) for tweet_id in ids]
+        authors = sorted({tweet['author_id'] for tweet in tweets})
+        meta = {'newest_id': tweets[0]['id'], 'oldest_id': tweets[-1]['id'], 'result_count': len(tweets)}
+        if more:
+            meta['next_token'] = '%x' % ids[-1]
+        return {'data': tweets,
+                'includes': {'users': [{'id': author, 'name': 'User %s' % author, 'username': 'user%s' % author}
+                                       for author in authors]},
+                'meta': meta}
+
+    def counts_all(self, path, params) -> dict:
+        archive = self.server.archive
+        start_ms, end_ms = self.time_range(params)
+        granularity = params.get('granularity', 'hour')
+        step = GRANULARITY_MS[granularity]
+
+        # the first bucket starts at start_time, the others on the granularity boundaries
+        edges = [start_ms] + list(range((start_ms // step + 1) * step, end_ms, step)) + [end_ms]
+        buckets = list(zip(edges[:-1], edges[1:]))
+
+        # pages go back in time from end_time, each holding its buckets in chronological order
+        page = int(params.get('next_token', '0'), 16)
+        size = COUNTS_PAGE[granularity]
+        stop = len(buckets) - page * size
+        selected = buckets[max(stop - size, 0):max(stop, 0)]
+
+        data = [{'start': format_time(start), 'end': format_time(end), 'tweet_count': archive.count_between(start, end)}
+                for start, end in selected]
+        meta = {'total_tweet_count': sum(bucket['tweet_count'] for bucket in data)}
+        if stop - size > 0:
+            meta['next_token'] = '%x' % (page + 1)
+        return {'data': data, 'meta': meta}
+
+    def users_by(self, path, params) -> dict:
+        def user(username):
+            return {'id': str(user_id(username)), 'name': username.title(), 'username': username}
+
+        parts = path.strip('/').split('/')
+        if parts[-2] == 'username':
+            return {'data': user(parts[-1])}
+        return {'data': [user(username) for username in params['usernames'].split(',')]}
+
+    def users_tweets(self, path, params) -> dict:
+        archive = self.server.archive
+        user = int(path.strip('/').split('/')[2])
+        max_results = int(params.get('max_results', 10))
+        if not 5 <= max_results <= 100:
+            raise ValueError("'max_results' must be between 5 and 100")
+
+        first = int(params.get('pagination_token', '0'), 16)
+        last = min(first + max_results, archive.timeline)
+        tweets = [archive.tweet(archive.timeline_id(user, index), author=user) for index in range(first, last)]
+        if not tweets:
+            return {'meta': {'result_count': 0}}
+
+        meta = {'newest_id': tweets[0]['id'], 'oldest_id': tweets[-1]['id'], 'result_count': len(tweets)}
+        if last < archive.timeline:
+            meta['next_token'] = '%x' % last
+        return {'data': tweets, 'meta': meta}
+
+    def log_message(self, format, *args) -> None:
+        # one line per request would flood the console
+        pass
+
+
+def make_server(port=8770, volume=1000, timeline=3200, window=900, limits=None, latency=0.0, jitter=0.0,
+                error_rate=0.0, seed=0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockApiHandler)
+    server.daemon_threads = True
+    server.archive = SyntheticArchive(volume, timeline, seed)
+    server.rate_limits = RateLimits(dict(DEFAULT_LIMITS, **(limits or {})), window)
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.stats = {'requests': 0, 'tweets': 0, 'rate_limited': 0, 'errors': 0}
+    server.stats_lock = threading.Lock()
+
+    def count(name, value=1):
+        with server.stats_lock:
+            server.stats[name] += value
+
+    server.count = count
+    return server
+
+
+def main() -> None:
+    args = add_args()
+    limits = {}
+    for item in args.limit:
+        endpoint, _, value = item.partition('=')
+        if endpoint not in DEFAULT_LIMITS or not value.isdigit():
+            sys.stdout.write('Invalid limit: %s\nQuitting...' % item)
+            return
+        limits[endpoint] = int(value)
+
+    server = make_server(args.port, args.volume, args.timeline, args.window, limits, args.latency, args.jitter,
+                         args.errorrate, args.seed)
+    print('Serving the mock Twitter API on http://127.0.0.1:%i' % server.server_address[1])
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print('Server stopped. %s' % json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
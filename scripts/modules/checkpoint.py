@@ -0,0 +1,44 @@
+import os
+import json
+
+
+def sync_file(f) -> int:
+    """
+    Flushes f to disk and returns its size in bytes.
+    """
+    f.flush()
+    os.fsync(f.fileno())
+    return os.fstat(f.fileno()).st_size
+
+
+class Checkpoint:
+    """
+    Progress of a long run, saved as a small JSON file next to its output. save() writes a temporary file and renames
+    it over the old one, so a crash leaves either the previous checkpoint or the new one, never a mix. The output is
+    synced before the checkpoint that points into it is saved.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+
+    def load(self):
+        """
+        Returns the saved state, or None if there is no readable checkpoint.
+        """
+        try:
+            with open(self.fname, 'r', encoding='utf8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, state) -> None:
+        tmp_fname = self.fname + '.tmp'
+        with open(tmp_fname, 'w', encoding='utf8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fname, self.fname)
+
+    def clear(self) -> None:
+        if os.path.exists(self.fname):
+            os.remove(self.fname)
@@ -0,0 +1,160 @@
+"""
+Compact, NumPy-only form of the sentiment classifier.
+
+    At inference time the three sub-models are linear functions over a bag of words: logistic regression and the
+    linear-kernel SVM score with coef @ x + intercept, and multinomial naive Bayes with feature_log_prob @ x +
+    class_log_prior. export_compact_model writes the shared vocabulary and those matrices to an .npz bundle, and
+    CompactSentimentModel predicts from it with NumPy alone, so inference workers skip importing scikit-learn and
+    pandas and unpickling the fitted estimators.
+"""
+
+import os
+
+import numpy as np
+
+from .preprocessing import STEM_CACHE, clean_text
+from .sentiment import Sentiment, resolve_votes
+
+# default location: <repo>/DATA/models/sentiment_compact.npz
+COMPACT_MODEL_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'models',
+                                                  'sentiment_compact.npz'))
+
+# (bundle prefix, classifier attribute, column attribute) of each sub-model
+SUB_MODELS = [('positive_negative', 'classifierLRPositiveNegative', 'columnsPositiveNegative'),
+              ('positive_neutral', 'classifierMultinomialPositiveNeutral', 'columnsPositiveNeutral'),
+              ('negative_neutral', 'classifierSVMNegativeNeutral', 'columnsNegativeNeutral')]
+
+
+def linear_parameters(estimator):
+    """
+    Returns (kind, weights, intercept) of a fitted binary estimator, with one row of weights per decision function.
+    """
+    if hasattr(estimator, 'feature_log_prob_'):
+        # ComplementNB has no class prior in its decision, MultinomialNB adds class_log_prior_
+        prior = getattr(estimator, 'class_log_prior_', None)
+        if type(estimator).__name__ == 'ComplementNB' or prior is None:
+            prior = np.zeros(len(estimator.classes_))
+        return 'nb', estimator.feature_log_prob_, prior
+
+    if not hasattr(estimator, 'coef_'):
+        raise ValueError('%s has no linear decision function' % type(estimator).__name__)
+
+    coef = estimator.coef_
+    if hasattr(coef, 'toarray'):
+        coef = coef.toarray()
+    # libsvm predicts the second class on a zero decision, the other linear models predict the first one
+    kind = 'svm' if hasattr(estimator, 'support_vectors_') else 'linear'
+    return kind, np.asarray(coef), np.asarray(estimator.intercept_)
+
+
+def export_compact_model(classifier, path=COMPACT_MODEL_FILE, dtype='float32') -> str:
+    """
+    Writes the fitted sub-models of a SentimentClassifier to an .npz bundle, with each weight matrix expanded to the
+    shared vocabulary. The stems cached by the classifier go along, so the predictor rarely needs the nltk stemmer.
+    """
+    if classifier.columnsPositiveNegative is None:
+        raise ValueError('only the vocabulary feature space can be exported')
+
+    vocabulary = classifier.sharedVectorizer.vocabulary
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, index in vocabulary.items():
+        terms[index] = term
+
+    stems = classifier.stem_cache.entries
+    bundle = {'terms': terms.astype(str),
+              'stem_words': np.array(list(stems.keys()), dtype=str),
+              'stem_values': np.array(list(stems.values()), dtype=str)}
+
+    for prefix, estimator_name, columns_name in SUB_MODELS:
+        estimator = getattr(classifier, estimator_name)
+        kind, coef, intercept = linear_parameters(estimator)
+        if coef.shape[0] != 1 and kind != 'nb':
+            raise ValueError('%s is not a binary model' % estimator_name)
+
+        weights = np.zeros((coef.shape[0], len(terms)), dtype=dtype)
+        weights[:, getattr(classifier, columns_name)] = coef
+        bundle[prefix + '_kind'] = np.array(kind)
+        bundle[prefix + '_weights'] = weights
+        bundle[prefix + '_intercept'] = np.asarray(intercept, dtype=np.float64)
+        bundle[prefix + '_classes'] = np.asarray(estimator.classes_, dtype=np.int64)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, **bundle)
+    os.replace(tmp, path)
+    return path
+
+
+class CompactSentimentModel:
+    """
+    Predicts with the bundle written by export_compact_model. Same predict/predict_batch interface as
+    SentimentClassifier, and the same labels: scores are accumulated in float64 and ties are broken the way each
+    scikit-learn estimator breaks them.
+    """
+
+    def __init__(self, path=COMPACT_MODEL_FILE):
+        self.path = path
+        with np.load(path, allow_pickle=False) as bundle:
+            self.vocabulary = {term: index for index, term in enumerate(bundle['terms'].tolist())}
+            self.models = {}
+            for prefix, _, _ in SUB_MODELS:
+                self.models[prefix] = (str(bundle[prefix + '_kind']), bundle[prefix + '_weights'],
+                                       bundle[prefix + '_intercept'], bundle[prefix + '_classes'])
+            self.stem_cache = STEM_CACHE
+            self.stem_cache.update(dict(zip(bundle['stem_words'].tolist(), bundle['stem_values'].tolist())))
+
+    def preprocess_data(self, data: str) -> list:
+        stem = self.stem_cache.stem
+        return [stem(word).lower() for word in clean_text(data).split()]
+
+    def featurize(self, texts):
+        """
+        Returns (rows, columns) with one entry per known token; repeated tokens are summed by np.bincount later.
+        """
+        rows = []
+        columns = []
+        vocabulary = self.vocabulary
+        for row, text in enumerate(texts):
+            for token in self.preprocess_data(text):
+                column = vocabulary.get(token)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+        return np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)
+
+    def decide(self, prefix, rows, columns, n) -> tuple:
+        """
+        Returns the predicted classes of a sub-model and its decision values, positive when favouring classes[1].
+        """
+        kind, weights, intercept, classes = self.models[prefix]
+        contributions = weights[:, columns]
+        scores = np.empty((weights.shape[0], n))
+        for index in range(weights.shape[0]):
+            scores[index] = np.bincount(rows, weights=contributions[index], minlength=n)
+        scores += intercept[:, None]
+
+        if kind == 'nb':
+            return classes[np.argmax(scores, axis=0)], scores[1] - scores[0]
+        if kind == 'svm':
+            return classes[(scores[0] >= 0).astype(np.int64)], scores[0]
+        return classes[(scores[0] > 0).astype(np.int64)], scores[0]
+
+    def predict_batch_scores(self, texts: list) -> tuple:
+        if len(texts) == 0:
+            return [], np.empty((0, 3))
+
+        rows, columns = self.featurize(texts)
+        n = len(texts)
+        resultPositiveNegative, scorePositiveNegative = self.decide('positive_negative', rows, columns, n)
+        resultPositiveNeutral, scorePositiveNeutral = self.decide('positive_neutral', rows, columns, n)
+        resultNegativeNeutral, scoreNegativeNeutral = self.decide('negative_neutral', rows, columns, n)
+
+        sentiments = [Sentiment(code) for code in
+                      resolve_votes(resultPositiveNeutral, resultNegativeNeutral, resultPositiveNegative)]
+        return sentiments, np.column_stack([scorePositiveNegative, scorePositiveNeutral, scoreNegativeNeutral])
+
+    def predict_batch(self, texts: list) -> list:
+        return self.predict_batch_scores(texts)[0]
+
+    def predict(self, data: str) -> Sentiment:
+        return self.predict_batch([data])[0]
@@ -0,0 +1,170 @@
+import re
+import time
+import logging
+import threading
+
+from .twitter_api import API_URL, KEYS_FILE, ApiUrlAdapter
+
+log = logging.getLogger(__name__)
+
+# seconds between requests of one key to endpoints with a per-second limit besides their window
+ENDPOINT_INTERVALS = {'/2/tweets/search/all': 1.05, '/2/tweets/counts/all': 1.05}
+
+# requests a key may send in a burst to the other endpoints
+BURST = 10
+
+
+def read_keys(fname=KEYS_FILE) -> list:
+    """
+    Returns the bearer tokens of fname, one per non-empty line, each once.
+    """
+    with open(fname, 'r') as f:
+        keys = [line.strip() for line in f.read().splitlines()]
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def endpoint_of(url) -> str:
+    # rate limits are per route, so user ids are left out
+    path = url.split('://', 1)[-1].split('/', 1)[-1].split('?', 1)[0]
+    return re.sub(r'/\d+(?=/|$)', '/:id', '/' + path)
+
+
+class KeyBucket:
+    """
+    Token bucket of one key on one endpoint. It refills at the pace that spends the quota the API reported as
+    remaining by the time the window resets, never faster than the endpoint's per-second limit, and holds at most
+    capacity tokens. Until the first response of the endpoint arrives only that per-second limit applies.
+    """
+
+    def __init__(self, interval=None):
+        self.capacity = 1.0 if interval else float(BURST)
+        self.max_rate = 1 / interval if interval else float('inf')
+        self.rate = self.max_rate
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.remaining = None
+        self.reset = None
+        self.blocked_until = 0.0
+
+    def refill(self, now) -> None:
+        if self.reset is not None and time.time() >= self.reset:
+            # a new window: the quota is back until the next response says otherwise
+            self.remaining, self.reset, self.rate = None, None, self.max_rate
+        if self.rate == float('inf'):
+            self.tokens = self.capacity
+        else:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, now) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def update(self, status, headers, now) -> None:
+        remaining = headers.get('x-rate-limit-remaining')
+        reset = headers.get('x-rate-limit-reset')
+        if remaining is not None and reset is not None:
+            self.remaining = int(remaining)
+            self.reset = int(reset)
+            seconds = max(self.reset - time.time(), 1.0)
+            self.rate = min(self.max_rate, self.remaining / seconds)
+
+        if status == 429 or self.remaining == 0:
+            if self.remaining:
+                # quota left, so it was the per-second limit: wait a little
+                self.blocked_until = now + 1 / min(self.max_rate, 1.0)
+            else:
+                self.blocked_until = now + max((self.reset or time.time() + 60) - time.time(), 1.0)
+            self.tokens = 0.0
+
+
+class CredentialPool:
+    """
+    Spreads the requests of one or more gathering clients over all the bearer tokens of DATA/keys.txt. Each key has a
+    token bucket per endpoint, fed by the x-rate-limit-* headers of its responses; a request goes to the key with the
+    most tokens, and waits when none has one. A key that runs out of quota or gets a 429 is set aside until its
+    window resets, and the request is sent again with another key.
+    """
+
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError('no bearer token given')
+        self.keys = list(keys)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.requests = dict.fromkeys(self.keys, 0)
+
+    @classmethod
+    def from_file(cls, fname=KEYS_FILE):
+        return cls(read_keys(fname))
+
+    def bucket(self, key, endpoint) -> KeyBucket:
+        bucket = self.buckets.get((key, endpoint))
+        if bucket is None:
+            bucket = self.buckets[(key, endpoint)] = KeyBucket(ENDPOINT_INTERVALS.get(endpoint))
+        return bucket
+
+    def acquire(self, endpoint) -> str:
+        """
+        Takes a token for endpoint and returns the key it belongs to, waiting for one if needed.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                best, best_score, wait = None, None, None
+                for key in self.keys:
+                    bucket = self.bucket(key, endpoint)
+                    bucket.refill(now)
+                    key_wait = bucket.wait_time(now)
+                    if key_wait == 0:
+                        score = (bucket.tokens, bucket.remaining if bucket.remaining is not None else float('inf'))
+                        if best is None or score > best_score:
+                            best, best_score = key, score
+                    elif wait is None or key_wait < wait:
+                        wait = key_wait
+
+                if best is not None:
+                    self.bucket(best, endpoint).tokens -= 1
+                    self.requests[best] += 1
+                    return best
+
+            time.sleep(min(wait, 5.0))
+
+    def update(self, key, endpoint, response) -> None:
+        with self.lock:
+            self.bucket(key, endpoint).update(response.status_code, response.headers, time.monotonic())
+
+
+class PooledAdapter(ApiUrlAdapter):
+    """
+    Signs each request with a key of the pool, replacing the token the client library set, and fails over to
+    another key on a 429. The 429 is handed back to the library only after every key had a go.
+    """
+
+    def __init__(self, pool, api_url=None, **kwargs):
+        super().__init__(api_url, **kwargs)
+        self.pool = pool
+
+    def send(self, request, **kwargs):
+        endpoint = endpoint_of(request.url)
+        for attempt in range(len(self.pool.keys) + 1):
+            key = self.pool.acquire(endpoint)
+            request.headers['Authorization'] = 'Bearer ' + key
+            response = super().send(request, **kwargs)
+            self.pool.update(key, endpoint, response)
+            if response.status_code != 429 or attempt == len(self.pool.keys):
+                return response
+            log.info('key %i of %i is rate limited on %s, trying another one', self.pool.keys.index(key) + 1,
+                     len(self.pool.keys), endpoint)
+            response.close()
+
+
+def mount_pool(session, pool, api_url=None):
+    """
+    Sends the Twitter API requests of session through pool, and to api_url when given.
+    """
+    session.mount(API_URL + '/', PooledAdapter(pool, api_url))
+    return session
@@ -0,0 +1,59 @@
+import hashlib
+
+from .preprocessing import clean_text
+
+
+class TextDeduplicator:
+    """
+    Remembers the label of every text already classified, keyed by a hash of the text as the classifier sees it
+    (clean_text with runs of spaces collapsed). Retweets and copies of a text then cost a dict lookup instead of a
+    classification, and the labels stay exactly the ones the classifier would give each copy.
+
+    plan() splits a batch into known labels and the unique texts still to classify; resolve() takes the labels of
+    those texts and fans them back out to every row of the batch. Keeping both halves apart lets the classification
+    happen elsewhere, e.g. in a worker process.
+    """
+
+    def __init__(self, maxsize=1000000):
+        self.maxsize = maxsize
+        self.labels = {}
+        self.total = 0
+        self.classified = 0
+
+    @staticmethod
+    def key(text) -> bytes:
+        normalized = ' '.join(clean_text(text).split())
+        return hashlib.blake2b(normalized.encode('utf8'), digest_size=16).digest()
+
+    def plan(self, texts):
+        """
+        Returns (keys, known, unique_keys, unique_texts): the key of each text, the labels already known for the
+        batch and the first text of each key that still has to be classified.
+        """
+        keys = [self.key(text) for text in texts]
+        known = {}
+        unique = {}
+        for key, text in zip(keys, texts):
+            if key in known or key in unique:
+                continue
+            label = self.labels.get(key)
+            if label is not None:
+                known[key] = label
+            else:
+                unique[key] = text
+        return keys, known, list(unique), list(unique.values())
+
+    def resolve(self, plan, sentiments) -> list:
+        keys, known, unique_keys, _ = plan
+        for key, sentiment in zip(unique_keys, sentiments):
+            known[key] = sentiment
+            if len(self.labels) >= self.maxsize:
+                del self.labels[next(iter(self.labels))]
+            self.labels[key] = sentiment
+
+        self.total += len(keys)
+        self.classified += len(unique_keys)
+        return [known[key] for key in keys]
+
+    def avoided(self) -> int:
+        return self.total - self.classified
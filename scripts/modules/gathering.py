@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# marks the end of a source in the queues
+END = object()
+
+
+class GatheringEngine:
+    """
+    Runs page sources through three stages joined by bounded asyncio queues:
+
+        fetch      one task per source advances its page iterator in a thread, at most concurrency sources at once
+        transform  transformers tasks turn each page into output items in a thread pool
+        write      one task hands the items of each source to its sink, in page order, in a thread of its own
+
+    Fetching, transforming and writing overlap: a fetcher requests the next page as soon as it has queued the last
+    one, while earlier pages are still being transformed and written. A full queue makes the stage before it wait,
+    so at most queue_size pages sit between two stages however far the network gets ahead of the disk.
+
+    Each source is a (pages, sink) pair: pages is an iterator of API pages, blocking on the network, and
+    sink(page, items) writes the items of a page and returns False once the source needs no more pages.
+    """
+
+    def __init__(self, transform, concurrency=1, transformers=2, queue_size=8):
+        self.transform = transform
+        self.concurrency = max(concurrency, 1)
+        self.transformers = max(transformers, 1)
+        self.queue_size = max(queue_size, 1)
+
+    def run(self, sources) -> None:
+        asyncio.run(self.gather(sources))
+
+    @staticmethod
+    def next_page(iterator):
+        # each page is requested when its iterator is advanced
+        return next(iterator, END)
+
+    async def gather(self, sources) -> None:
+        loop = asyncio.get_running_loop()
+        pages = asyncio.Queue(self.queue_size)
+        items = asyncio.Queue(self.queue_size)
+        slots = asyncio.Semaphore(self.concurrency)
+        complete = [False] * len(sources)
+
+        with ThreadPoolExecutor(self.concurrency) as fetch_pool, \
+                ThreadPoolExecutor(self.transformers) as transform_pool, \
+                ThreadPoolExecutor(1) as write_pool:
+
+            async def fetch(index):
+                async with slots:
+                    iterator = iter(sources[index][0])
+                    sequence = 0
+                    while not complete[index]:
+                        page = await loop.run_in_executor(fetch_pool, self.next_page, iterator)
+                        if page is END:
+                            break
+                        await pages.put((index, sequence, page))
+                        sequence += 1
+                await pages.put((index, sequence, END))
+
+            async def transform():
+                while True:
+                    entry = await pages.get()
+                    if entry is None:
+                        return
+                    index, sequence, page = entry
+                    result = END if page is END else await loop.run_in_executor(transform_pool, self.transform, page)
+                    await items.put((index, sequence, page, result))
+
+            async def write():
+                # transformers can finish pages out of order, so they are held until their turn
+                expected = [0] * len(sources)
+                pending = {}
+                ended = 0
+                while ended < len(sources):
+                    index, sequence, page, result = await items.get()
+                    pending[(index, sequence)] = (page, result)
+                    while (index, expected[index]) in pending:
+                        page, result = pending.pop((index, expected[index]))
+                        expected[index] += 1
+                        if result is END:
+                            ended += 1
+                        elif not complete[index]:
+                            sink = sources[index][1]
+                            if not await loop.run_in_executor(write_pool, sink, page, result):
+                                complete[index] = True
+
+                for _ in range(self.transformers):
+                    await pages.put(None)
+
+            tasks = [asyncio.ensure_future(write())]
+            tasks += [asyncio.ensure_future(transform()) for _ in range(self.transformers)]
+            tasks += [asyncio.ensure_future(fetch(index)) for index in range(len(sources))]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
@@ -3,8 +3,13 @@ import csv
 import ijson
 import pathlib
 
+from .sidecar import join_sidecar
+
 
 class Loader:
+    def __init__(self):
+        self.stream = None
+
     def detect_delimiter(self, csv_file):
         with open(csv_file, 'r', encoding='utf8') as csvfile:
             temp_lines = csvfile.readline() + '\n' + csvfile.readline()
@@ -26,14 +31,51 @@ class Loader:
             print('File loaded successfully! Processing...')
             return items
 
-    def read_file(self, fname):
+    def read_file(self, fname, sidecar=None):
+        # sidecar: a .sentiment file from sentiment_analysis.py -sc whose labels are added to the tweets
         extension = pathlib.Path(fname).suffix
         if extension == '.csv':
             print('Loading CSV file...')
-            return self.load_csv(fname)
+            items = self.load_csv(fname)
         elif extension == '.json':
             print('Loading JSON file...')
-            return self.load_json(fname)
+            items = self.load_json(fname)
+        else:
+            print('Input file must be in CSV or JSON format\nQuitting...')
+            sys.exit(0)
+
+        if sidecar is not None:
+            items = list(join_sidecar(items, sidecar))
+        return items
+
+    def stream_json(self, fname):
+        with open(fname, 'rb') as f:
+            self.stream = f
+            yield from ijson.items(f, 'item', use_float=True)
+        self.stream = None
+
+    def stream_csv(self, fname):
+        dia = self.detect_delimiter(fname)
+        with open(fname, 'r', encoding='utf8') as csvfile:
+            self.stream = csvfile.buffer
+            yield from csv.DictReader(csvfile, dialect=dia)
+        self.stream = None
+
+    def stream_file(self, fname, sidecar=None):
+        # yields the tweets one at a time instead of loading the whole file
+        extension = pathlib.Path(fname).suffix
+        if extension == '.csv':
+            tweets = self.stream_csv(fname)
+        elif extension == '.json':
+            tweets = self.stream_json(fname)
         else:
             print('Input file must be in CSV or JSON format\nQuitting...')
             sys.exit(0)
+
+        if sidecar is not None:
+            return join_sidecar(tweets, sidecar)
+        return tweets
+
+    def bytes_read(self):
+        # approximate position of the file being streamed, read-ahead included
+        return self.stream.tell() if self.stream is not None else 0
@@ -0,0 +1,143 @@
+"""
+Artifact store for trained models.
+
+    A model is saved together with a fingerprint made of the training dataset hash, the versions of the libraries
+    that produced it and the training configuration. An artifact is only loaded back when its fingerprint matches the
+    current one, so editing the dataset or upgrading scikit-learn triggers a retrain instead of a stale or broken load.
+
+    File layout: MAGIC, then a pickled header with the fingerprint (plain dicts and strings only), then the pickled
+    state. The header is compared before the state is unpickled, so the fitted estimators of another library version
+    are never deserialized.
+"""
+
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+from importlib import metadata
+
+# default location: <repo>/DATA/models
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'models'))
+
+FINGERPRINT_PACKAGES = ['scikit-learn', 'nltk', 'numpy', 'scipy', 'pandas']
+
+MAGIC = b'TWMODEL2\n'
+
+# errors of unpickling an artifact that is damaged or was written by other versions of the libraries
+LOAD_ERRORS = (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError)
+
+
+def file_hash(fname) -> str:
+    digest = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def library_versions() -> dict:
+    versions = {'python': sys.version.split()[0]}
+    for package in FINGERPRINT_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def dump_artifact(path, header: dict, state) -> None:
+    """
+    Pickles header and state to path through a temporary file of its own in the same directory, so concurrent saves
+    never write to the same file and readers only ever see a complete artifact.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_artifact(path, fingerprint: dict):
+    """
+    Returns (header, state) of the artifact at path if its fingerprint matches, otherwise None. The state is only
+    unpickled after the header matched.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header = pickle.load(f)
+            if not isinstance(header, dict) or header.get('fingerprint') != fingerprint:
+                return None
+            return header, pickle.load(f)
+    except LOAD_ERRORS:
+        return None
+
+
+class ModelStore:
+    def __init__(self, name: str, models_dir: str = MODELS_DIR):
+        self.path = os.path.join(models_dir, name + '.pkl')
+
+    def fingerprint(self, dataset: str, config: dict = None) -> dict:
+        return {'dataset': file_hash(dataset), 'versions': library_versions(), 'config': config or {}}
+
+    def load(self, fingerprint: dict):
+        """
+        Returns the stored state if its fingerprint matches, otherwise None.
+        """
+        loaded = load_artifact(self.path, fingerprint)
+        return loaded[1] if loaded is not None else None
+
+    def save(self, fingerprint: dict, state) -> None:
+        dump_artifact(self.path, {'fingerprint': fingerprint}, state)
+
+    def version_path(self, version: int) -> str:
+        return '%s.v%04i.pkl' % (self.path[:-len('.pkl')], version)
+
+    def versions(self) -> list:
+        """
+        Returns the numbers of the saved versions, oldest first.
+        """
+        directory, base = os.path.split(self.path[:-len('.pkl')])
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+
+        found = []
+        for name in names:
+            if name.startswith(base + '.v') and name.endswith('.pkl'):
+                number = name[len(base) + 2:-len('.pkl')]
+                if number.isdigit():
+                    found.append(int(number))
+        return sorted(found)
+
+    def load_version(self, fingerprint: dict, version: int = None):
+        """
+        Returns (version, info, state) of the given version, or of the latest one when version is None, if it was
+        derived from an artifact with this fingerprint. Otherwise None.
+        """
+        candidates = self.versions() if version is None else [version]
+        for number in reversed(candidates):
+            loaded = load_artifact(self.version_path(number), fingerprint)
+            if loaded is not None:
+                header, state = loaded
+                return number, header['info'], state
+        return None
+
+    def save_version(self, fingerprint: dict, state, info: dict, version: int = None) -> int:
+        """
+        Saves state as a new version (or over the given one) and returns its number. Earlier versions are kept, so
+        an update can be rolled back by loading an older one.
+        """
+        if version is None:
+            version = (self.versions() or [0])[-1] + 1
+        dump_artifact(self.version_path(version), {'fingerprint': fingerprint, 'version': version, 'info': info}, state)
+        return version
@@ -0,0 +1,119 @@
+import tempfile
+from array import array
+
+from modules.sketches import CountMinSketch
+
+
+# bits reserved for each token id inside a packed n-gram key
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+class NgramCounter:
+    """
+    Counts n-grams of a token stream. Tokens are mapped to integer ids and
+    each n-gram is packed into a single int, so a key costs one small int
+    instead of a tuple of strings.
+
+    With min_count > 1 rare n-grams are pruned in two passes: the first one
+    only feeds a count-min sketch per size and spills the id-encoded token
+    streams to a temporary file, the second one reads them back and counts
+    exactly the n-grams whose sketch estimate reaches min_count. The sketch
+    never undercounts, so no n-gram at or above the threshold is lost and the
+    reported counts are exact, while memory holds only the vocabulary, the
+    sketches and the surviving n-grams.
+    """
+
+    def __init__(self, sizes=(2, 3), min_count=0, sketch_width=1 << 18, tmp_dir=None):
+        self.sizes = sizes
+        self.min_count = min_count
+        self.vocabulary = {}
+        self.words = []
+        self.counts = {n: {} for n in sizes}
+        self.sketches = {n: CountMinSketch(sketch_width) for n in sizes} if min_count > 1 else None
+        # length-prefixed id arrays of the first pass; the file is gone once closed
+        self.pending = tempfile.TemporaryFile(dir=tmp_dir) if self.sketches is not None else None
+
+    def encode(self, tokens):
+        vocabulary = self.vocabulary
+        ids = array('I')
+        for token in tokens:
+            token_id = vocabulary.get(token)
+            if token_id is None:
+                token_id = vocabulary[token] = len(self.words)
+                self.words.append(token)
+            ids.append(token_id)
+        return ids
+
+    def packed(self, ids, n):
+        for start in range(len(ids) - n + 1):
+            key = 0
+            for token_id in ids[start:start + n]:
+                key = (key << ID_BITS) | token_id
+            yield key
+
+    def add(self, tokens):
+        ids = self.encode(tokens)
+        if self.sketches is None:
+            for n in self.sizes:
+                counts = self.counts[n]
+                for key in self.packed(ids, n):
+                    counts[key] = counts.get(key, 0) + 1
+        else:
+            for n in self.sizes:
+                sketch = self.sketches[n]
+                for key in self.packed(ids, n):
+                    sketch.add(key)
+            array('I', [len(ids)]).tofile(self.pending)
+            ids.tofile(self.pending)
+
+    def read_pending(self):
+        self.pending.seek(0)
+        while True:
+            length = array('I')
+            try:
+                length.fromfile(self.pending, 1)
+            except EOFError:
+                return
+            ids = array('I')
+            ids.fromfile(self.pending, length[0])
+            yield ids
+
+    def count_pending(self):
+        for ids in self.read_pending():
+            for n in self.sizes:
+                sketch = self.sketches[n]
+                counts = self.counts[n]
+                for key in self.packed(ids, n):
+                    if key in counts:
+                        counts[key] += 1
+                    elif sketch.estimate(key) >= self.min_count:
+                        counts[key] = 1
+        self.close()
+        self.sketches = None
+
+    def close(self):
+        if self.pending is not None:
+            self.pending.close()
+            self.pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def decode(self, key, n):
+        tokens = []
+        for _ in range(n):
+            tokens.append(self.words[key & ID_MASK])
+            key >>= ID_BITS
+        return ' '.join(reversed(tokens))
+
+    def most_common(self, n, limit):
+        """Top limit (phrase, count) pairs of size n, by count and then phrase, both descending."""
+        if self.sketches is not None:
+            self.count_pending()
+        ranked = [(self.decode(key, n), count) for key, count in self.counts[n].items() if count >= self.min_count]
+        ranked.sort(reverse=True, key=lambda k_v: (k_v[1], k_v[0]))
+        return ranked[:limit]
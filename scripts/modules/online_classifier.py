@@ -0,0 +1,163 @@
+"""
+Classificador de sentimento com treinamento incremental.
+
+    Usa o espaço de features hashed, que não depende do vocabulário do treinamento, e classificadores com partial_fit
+    (SGDClassifier e MultinomialNB) no lugar da regressão logística e do SVC. Novos tweets rotulados atualizam os
+    modelos sem treinar de novo com todo o dataset, e cada atualização é salva como uma nova versão no ModelStore.
+"""
+
+import os
+import json
+import time
+
+import numpy as np
+
+from .model_store import ModelStore
+from .sentiment_classifier import SentimentClassifier
+
+
+class OnlineSentimentClassifier(SentimentClassifier):
+    """
+    Classe com a implementação do classificador de sentimento com treinamento incremental.
+    """
+
+    # Códigos do dataset para os rótulos escritos pelo sentiment_analysis.py...
+    LABELS = {'neutral': 0, 'positive': 1, 'negative': 2}
+
+    # Estimadores com partial_fit dos três classificadores, registrados no fingerprint do modelo...
+    BACKENDS = ('sgdlog', 'nb', 'sgd')
+
+    # Classificadores e os códigos que cada um separa, como em train_sentiment_classifiers...
+    PAIRS = [('classifierLRPositiveNegative', (1, 2)),
+             ('classifierMultinomialPositiveNeutral', (0, 1)),
+             ('classifierSVMNegativeNeutral', (0, 2))]
+
+    def __init__(self, dataset: str = 'dataset.xlsx', model_store: ModelStore = None, retrain: bool = False,
+                 n_features: int = 2 ** 20, version: int = None):
+        """
+        Construtor da classe com a implementação do classificador de sentimento com treinamento incremental.
+
+        O modelo base é treinado com o dataset uma única vez. Depois, a versão mais recente derivada dele é
+        carregada, ou a versão pedida.
+
+        :param dataset: caminho do dataset de treinamento.
+        :param model_store: onde o modelo é salvo. Por padrão, DATA/models/sentiment_online.pkl e suas versões.
+        :param retrain: treina o modelo base novamente, descartando as atualizações.
+        :param n_features: número de colunas do espaço hashed.
+        :param version: versão a carregar. Por padrão, a mais recente.
+        """
+
+        # O construtor da classe base já pode salvar o modelo base, então a versão precisa existir antes...
+        self.version = None
+        self.info = {'examples': 0, 'sources': {}}
+        super().__init__(dataset, model_store or ModelStore('sentiment_online'), retrain, 'hashed', n_features,
+                         backends=self.BACKENDS)
+
+        if retrain:
+            return
+
+        loaded = self.model_store.load_version(self.fingerprint, version)
+        if loaded is not None:
+            self.version, self.info, state = loaded
+            self.set_model_state(state)
+        elif version is not None:
+            raise ValueError('version %i of the model does not exist or comes from another dataset' % version)
+
+    def partial_fit(self, texts: list, labels: list) -> None:
+        """
+        Função para atualizar os classificadores com um lote de tweets rotulados...
+
+        Cada tweet atualiza apenas os dois classificadores que separam o seu rótulo.
+
+        :param texts: uma lista de strings com os textos dos tweets
+        :param labels: os códigos do dataset de cada tweet (0 neutro, 1 positivo, 2 negativo)
+        :return: None
+        """
+
+        if len(texts) == 0:
+            return
+
+        vectors = self.sharedVectorizer.transform(texts)
+        labels = np.asarray(labels)
+        for name, pair in self.PAIRS:
+            mask = np.isin(labels, pair)
+            if mask.any():
+                getattr(self, name).partial_fit(vectors[mask], labels[mask], classes=np.array(pair))
+        self.info['examples'] += len(labels)
+
+    def read_labels(self, fname: str, offset: int = 0):
+        """
+        Função para ler os tweets rotulados de um arquivo JSONL a partir de uma posição...
+
+        Cada linha é um objeto com 'text' e 'emotion' ('positive', 'neutral' ou 'negative'). Uma última linha sem
+        quebra de linha ainda está sendo escrita e fica para a próxima atualização.
+
+        :param fname: o arquivo JSONL
+        :param offset: a posição, em bytes, da primeira linha ainda não lida
+        :return: um gerador de (texto, código, posição após a linha)
+        """
+
+        with open(fname, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                label = self.LABELS.get(str(item.get('emotion', '')).lower())
+                if label is None:
+                    raise ValueError("line ending at byte %i has no valid 'emotion'" % offset)
+                yield str(item['text']), label, offset
+
+    def update_from_file(self, fname: str, batch_size: int = 1000) -> int:
+        """
+        Função para atualizar os classificadores com as linhas adicionadas a um arquivo JSONL desde a última vez...
+        :param fname: o arquivo JSONL com os tweets rotulados
+        :param batch_size: número de tweets por chamada de partial_fit
+        :return: o número de tweets lidos
+        """
+
+        source = os.path.abspath(fname)
+        offset = self.info['sources'].get(source, 0)
+        if offset > os.path.getsize(fname):
+            # o arquivo foi recriado, então é lido desde o início
+            offset = 0
+
+        count = 0
+        texts, labels = [], []
+        for text, label, offset in self.read_labels(fname, offset):
+            texts.append(text)
+            labels.append(label)
+            if len(texts) >= batch_size:
+                self.partial_fit(texts, labels)
+                count += len(texts)
+                texts, labels = [], []
+                self.info['sources'][source] = offset
+        self.partial_fit(texts, labels)
+        count += len(texts)
+        if count:
+            self.info['sources'][source] = offset
+        return count
+
+    def save_version(self) -> int:
+        """
+        Função para salvar o modelo atualizado como uma nova versão...
+        :return: o número da versão
+        """
+
+        self.info['saved'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.version = self.model_store.save_version(self.fingerprint, self.get_model_state(), self.info)
+        return self.version
+
+    def save_model(self) -> None:
+        """
+        Função para salvar o modelo, junto com os radicais já calculados, na versão carregada...
+        :return: None
+        """
+
+        if self.version is None:
+            super().save_model()
+        else:
+            self.model_store.save_version(self.fingerprint, self.get_model_state(), self.info, self.version)
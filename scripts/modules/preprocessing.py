@@ -0,0 +1,99 @@
+"""
+Pré-processamento dos textos dos tweets para a classificação de sentimento.
+
+    Compartilhado pelo SentimentClassifier e pelo CompactSentimentModel. Este módulo não importa o scikit-learn nem o
+    nltk: o stemmer de Porter é uma cópia do nltk (porter.py), com os mesmos radicais.
+"""
+
+import re
+
+from .porter import PorterStemmer
+
+
+class StemCache:
+    """
+    Cache limitado dos radicais das palavras, compartilhado pelo processo.
+
+    O número de palavras distintas é muito menor que o número total de palavras dos tweets, então o custo do
+    stemming passa a acompanhar o tamanho do vocabulário e não o do corpus. Quando o cache atinge maxsize, as
+    entradas mais antigas são descartadas.
+    """
+
+    def __init__(self, maxsize: int = 200000):
+        self.maxsize = maxsize
+        self.stemmer = PorterStemmer()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def stem(self, word: str) -> str:
+        """
+        Função para obter o radical de uma palavra, calculando-o apenas na primeira vez...
+        :param word: a palavra
+        :return: o radical da palavra
+        """
+
+        stemmed = self.entries.get(word)
+        if stemmed is not None:
+            self.hits += 1
+            return stemmed
+
+        self.misses += 1
+        stemmed = self.stemmer.stem(word)
+        if len(self.entries) >= self.maxsize:
+            del self.entries[next(iter(self.entries))]
+        self.entries[word] = stemmed
+        return stemmed
+
+    def update(self, entries: dict) -> None:
+        """
+        Função para carregar radicais já calculados, por exemplo os salvos junto com o modelo...
+        :param entries: um dicionário de palavra para radical
+        :return: None
+        """
+
+        for word, stemmed in entries.items():
+            if len(self.entries) >= self.maxsize:
+                break
+            self.entries[word] = stemmed
+
+    def hit_rate(self) -> float:
+        """
+        Função para obter a fração das consultas respondidas pelo cache...
+        :return: a taxa de acerto, entre 0 e 1
+        """
+
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+# Expressões usadas no pré-processamento, compiladas uma única vez...
+SPECIAL_CHARACTERS_PATTERN = re.compile(r'[^a-zA-Z0-9\s]')
+NUMBERS_PATTERN = re.compile(r'\d+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PUNCTUATION_PATTERN = re.compile(r'[.?!,:;]')
+LINKS_PATTERN = re.compile(r'http\S+|www\S+|\S+\.com\S+')
+
+# Cache de stemming compartilhado por todos os classificadores do processo...
+STEM_CACHE = StemCache()
+
+
+def clean_text(data: str) -> str:
+    """
+    Função para limpar o texto de um tweet antes do stemming...
+
+    - Remove caracteres especiais, números, espaços em branco, pontuação e links.
+
+    O resultado contém apenas letras separadas por espaços, então o TweetTokenizer e str.split produzem os mesmos
+    tokens a partir dele.
+
+    :param data: Uma string com o texto do tweet.
+    :return: o texto limpo
+    """
+
+    data = SPECIAL_CHARACTERS_PATTERN.sub('', data)  # Remove caracteres especiais
+    data = NUMBERS_PATTERN.sub('', data)  # Remove números
+    data = WHITESPACE_PATTERN.sub(' ', data)  # Remove espaços em branco
+    data = PUNCTUATION_PATTERN.sub('', data)  # Remove pontuação
+    data = LINKS_PATTERN.sub('', data)  # remove links
+    return data
@@ -0,0 +1,77 @@
+import sys
+import time
+import threading
+
+
+class ProgressReporter:
+    """
+    Prints progress at most once per interval seconds. Each line goes through
+    the GUI console, so reporting every tweet would cost more than the work.
+    The ETA is estimated from the bytes read out of total_bytes.
+    """
+
+    def __init__(self, total_bytes=None, interval=0.5, unit='tweets'):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.unit = unit
+        self.start = time.monotonic()
+        self.last = self.start
+        self.count = 0
+        self.reported = None
+
+    def update(self, count, bytes_read=None):
+        self.count = count
+        now = time.monotonic()
+        if now - self.last >= self.interval:
+            self.last = now
+            self.report(now, bytes_read)
+
+    def report(self, now, bytes_read=None):
+        elapsed = now - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        line = 'Processed %i %s (%.0f %s/s' % (self.count, self.unit, rate, self.unit)
+
+        if self.total_bytes and bytes_read:
+            fraction = min(bytes_read / self.total_bytes, 1.0)
+            remaining = elapsed * (1 - fraction) / fraction
+            line += ', %.0f%%, ETA %s' % (fraction * 100, time.strftime('%H:%M:%S', time.gmtime(remaining)))
+
+        sys.stdout.write(line + ')\n')
+        sys.stdout.flush()
+        self.reported = self.count
+
+    def finish(self):
+        if self.reported != self.count:
+            self.report(time.monotonic())
+
+
+class CollectedCounter:
+    """
+    Tweets collected by a gathering run, possibly from several threads, shown
+    with the gathering scripts' progress line at most once per interval seconds.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.total = 0
+        self.last = 0.0
+        self.reported = None
+
+    def add(self, count=1):
+        with self.lock:
+            self.total += count
+            now = time.monotonic()
+            if now - self.last >= self.interval:
+                self.last = now
+                self.report()
+
+    def report(self):
+        sys.stdout.write("\rNumber of tweets collected so far...: %i" % self.total)
+        sys.stdout.flush()
+        self.reported = self.total
+
+    def finish(self):
+        with self.lock:
+            if self.reported != self.total:
+                self.report()
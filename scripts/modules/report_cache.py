@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+
+
+# default location: <repo>/DATA/cache/reports
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'cache', 'reports'))
+
+# bytes hashed from the start and from the end of each input file
+SAMPLE_SIZE = 1024 * 1024
+
+
+class ReportCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def fingerprint_file(self, fname, digest):
+        # size, mtime and the first/last megabyte are enough to tell files apart
+        # without reading multi-gigabyte datasets end to end
+        stat = os.stat(fname)
+        digest.update(('%s:%i:%i;' % (os.path.abspath(fname), stat.st_size, stat.st_mtime_ns)).encode('utf8'))
+        with open(fname, 'rb') as f:
+            digest.update(f.read(SAMPLE_SIZE))
+            if stat.st_size > 2 * SAMPLE_SIZE:
+                f.seek(-SAMPLE_SIZE, os.SEEK_END)
+                digest.update(f.read(SAMPLE_SIZE))
+
+    def make_key(self, infile, stopword_files, **options):
+        digest = hashlib.blake2b(digest_size=20)
+        self.fingerprint_file(infile, digest)
+        # stopword lists are small, hash their whole content
+        for fname in stopword_files:
+            with open(fname, 'rb') as f:
+                digest.update(f.read())
+        digest.update(json.dumps(options, sort_keys=True).encode('utf8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.txt')
+
+    def get(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf8') as f:
+                summary = f.read()
+        except OSError:
+            return None
+        # touch the entry so it becomes the most recently used one
+        os.utime(path)
+        return summary
+
+    def put(self, key, summary):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.txt'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+        # drop least recently used entries until the cache fits its budget
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    os.remove(entry.path)
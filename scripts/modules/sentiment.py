@@ -0,0 +1,32 @@
+from enum import Enum
+
+import numpy as np
+
+
+class Sentiment(Enum):
+    """
+    Enum os sentimentos a serem classificados nos tweets.
+    """
+
+    NEGATIVE = 0
+    POSITIVE = 1
+    NEUTRAL = 2
+
+
+def resolve_votes(resultPositiveNeutral, resultNegativeNeutral, resultPositiveNegative) -> np.ndarray:
+    """
+    Função para combinar os resultados dos três classificadores...
+
+    A primeira regra satisfeita vence: neutro se os dois classificadores com neutro votarem neutro (0), positivo
+    se os dois com positivo votarem positivo (1), negativo se os dois com negativo votarem negativo (2) e neutro
+    nos demais casos.
+
+    :return: um array com o valor do Sentiment de cada tweet
+    """
+
+    return np.select(
+        [(resultPositiveNeutral == 0) & (resultNegativeNeutral == 0),
+         (resultPositiveNeutral == 1) & (resultPositiveNegative == 1),
+         (resultNegativeNeutral == 2) & (resultPositiveNegative == 2)],
+        [Sentiment.NEUTRAL.value, Sentiment.POSITIVE.value, Sentiment.NEGATIVE.value],
+        default=Sentiment.NEUTRAL.value)
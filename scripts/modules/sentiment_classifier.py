@@ -8,33 +8,80 @@ Twitter Sentiment Classifier
 - Email: anderson.sprenger@edu.pucrs.br
 - Date: June 22, 2023
 
-The script utilizes the following classifiers:
+The script utilizes the following classifiers by default (see ESTIMATORS for the alternatives):
 
 - Logistic Regression
 - Multinomial Naive Bayes
 - Support Vector Machine
 """
 
-import re
-from enum import Enum
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-import pandas as pd
-from nltk.stem import PorterStemmer
+import numpy as np
 from nltk.tokenize import TweetTokenizer
 from sklearn import svm
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.naive_bayes import MultinomialNB
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.naive_bayes import ComplementNB, MultinomialNB
 
+from .model_store import ModelStore
+from .preprocessing import STEM_CACHE, clean_text
+from .sentiment import Sentiment, resolve_votes
+from .training_data import load_training_data
 
-class Sentiment(Enum):
+
+# Estimadores que podem ser usados em cada um dos três classificadores...
+ESTIMATORS = {
+    'lr': lambda: LogisticRegression(random_state=0),
+    'nb': lambda: MultinomialNB(),
+    'svc': lambda: svm.SVC(kernel='linear'),
+    'linearsvc': lambda: svm.LinearSVC(random_state=0),
+    'sgd': lambda: SGDClassifier(random_state=0),
+    'sgdlog': lambda: SGDClassifier(loss='log_loss', random_state=0),
+    'complementnb': lambda: ComplementNB(),
+}
+
+# Estimadores dos classificadores positivo/negativo, positivo/neutro e negativo/neutro...
+DEFAULT_BACKENDS = ('lr', 'nb', 'svc')
+
+
+def make_estimator(name: str):
     """
-    Enum os sentimentos a serem classificados nos tweets.
+    Função para criar um estimador ainda não treinado a partir do seu nome em ESTIMATORS...
+    :param name: o nome do estimador
+    :return: o estimador
     """
 
-    NEGATIVE = 0
-    POSITIVE = 1
-    NEUTRAL = 2
+    if name not in ESTIMATORS:
+        raise ValueError('unknown estimator %r, expected one of %s' % (name, ', '.join(ESTIMATORS)))
+    return ESTIMATORS[name]()
+
+
+def decision_scores(estimator, vectors) -> np.ndarray:
+    """
+    Função para obter o valor de decisão de um classificador binário, positivo quando favorece classes_[1]...
+    :return: um array com um valor por linha de vectors
+    """
+
+    if hasattr(estimator, 'decision_function'):
+        return estimator.decision_function(vectors)
+    # os classificadores naive Bayes não têm decision_function
+    joint_log_likelihood = estimator.predict_joint_log_proba(vectors)
+    return joint_log_likelihood[:, 1] - joint_log_likelihood[:, 0]
+
+
+def fit_sub_model(vectorizer, classifier, texts, labels, fit_vectorizer: bool):
+    """
+    Função para vetorizar e treinar um dos classificadores, executada nos processos de treinamento...
+    :return: o vetorizador, o classificador treinado e o tempo gasto em segundos
+    """
+
+    start = time.perf_counter()
+    vectors = vectorizer.fit_transform(texts) if fit_vectorizer else vectorizer.transform(texts)
+    classifier.fit(vectors, labels)
+    return vectorizer, classifier, time.perf_counter() - start
 
 
 class SentimentClassifier:
@@ -42,60 +89,212 @@ class SentimentClassifier:
     Classe com a implementação do classificador de sentimento.
     """
 
-    def __init__(self):
+    # Atributos salvos no artefato do modelo...
+    MODEL_ATTRIBUTES = ['vectorizerPositiveNegative', 'vectorizerPositiveNeutral', 'vectorizerNegativeNeutral',
+                        'sharedVectorizer', 'columnsPositiveNegative', 'columnsPositiveNeutral',
+                        'columnsNegativeNeutral', 'classifierLRPositiveNegative',
+                        'classifierMultinomialPositiveNeutral', 'classifierSVMNegativeNeutral']
+
+    # Vetorizador, classificador e o código do dataset que cada modelo não separa...
+    SUB_MODELS = [('vectorizerPositiveNegative', 'classifierLRPositiveNegative', 0),
+                  ('vectorizerPositiveNeutral', 'classifierMultinomialPositiveNeutral', 2),
+                  ('vectorizerNegativeNeutral', 'classifierSVMNegativeNeutral', 1)]
+
+    def __init__(self, dataset: str = 'dataset.xlsx', model_store: ModelStore = None, retrain: bool = False,
+                 feature_space: str = 'vocabulary', n_features: int = 2 ** 20, training_jobs: int = 3,
+                 backends: tuple = DEFAULT_BACKENDS, load: bool = True):
         """
         Construtor da classe com a implementação do classificador de sentimento.
+
+        O modelo treinado é carregado do model_store quando o hash do dataset e as versões das bibliotecas coincidem
+        com as do artefato salvo. Caso contrário, os classificadores são treinados e o artefato é atualizado.
+
+        :param dataset: caminho do dataset de treinamento.
+        :param model_store: onde o modelo treinado é salvo. Por padrão, DATA/models/sentiment_classifier.pkl, com os
+            nomes dos estimadores no nome do arquivo quando backends não é o padrão e o espaço hashed e n_features
+            quando feature_space é 'hashed'.
+        :param retrain: ignora o artefato salvo e treina os classificadores novamente.
+        :param feature_space: 'vocabulary' usa o vocabulário aprendido no treinamento; 'hashed' usa um espaço de
+            n_features colunas obtido por hashing das palavras, com memória limitada para vocabulários grandes.
+        :param n_features: número de colunas do espaço hashed.
+        :param training_jobs: número de processos que treinam os três classificadores ao mesmo tempo.
+        :param backends: os nomes, em ESTIMATORS, dos estimadores dos classificadores positivo/negativo,
+            positivo/neutro e negativo/neutro.
+        :param load: False apenas cria os classificadores, sem carregar nem treinar o modelo; o treinamento fica a
+            cargo de quem chama train_sentiment_classifiers, como no benchmark.
         """
 
         # Inicializando o tokenizador de tweets...
         self.tweet_tokenizer = TweetTokenizer()
 
-        # Inicializando o stemmer de palavras...
-        self.text_stemmer = PorterStemmer()
+        # Inicializando o stemmer de palavras, com cache compartilhado de radicais...
+        self.stem_cache = STEM_CACHE
 
         # Inicializando os vetorizadores de palavras...
-        self.vectorizerPositiveNegative = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize)
-        self.vectorizerPositiveNeutral = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize)
-        self.vectorizerNegativeNeutral = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize)
+        self.vectorizerPositiveNegative = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize,
+                                                          token_pattern=None)
+        self.vectorizerPositiveNeutral = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize,
+                                                         token_pattern=None)
+        self.vectorizerNegativeNeutral = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize,
+                                                         token_pattern=None)
+
+        # Inicializando o vetorizador compartilhado, que tokeniza cada texto uma única vez na classificação...
+        if feature_space not in ('vocabulary', 'hashed'):
+            raise ValueError("feature_space must be 'vocabulary' or 'hashed'")
+        self.feature_space = feature_space
+        self.sharedVectorizer = None
+        self.columnsPositiveNegative = None
+        self.columnsPositiveNeutral = None
+        self.columnsNegativeNeutral = None
+        if feature_space == 'hashed':
+            self.sharedVectorizer = HashingVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize,
+                                                      token_pattern=None, n_features=n_features,
+                                                      alternate_sign=False, norm=None)
 
         # Inicializando os classificadores...
-        self.classifierLRPositiveNegative = LogisticRegression(random_state=0)
-        self.classifierMultinomialPositiveNeutral = MultinomialNB()
-        self.classifierSVMNegativeNeutral = svm.SVC(kernel='linear')
-        self.train_sentiment_classifiers()
+        if len(backends) != 3:
+            raise ValueError('backends must name three estimators')
+        self.backends = tuple(backends)
+        self.create_classifiers()
+
+        self.training_jobs = training_jobs
+        self.fit_times = {}
+        self.dataset = dataset
+        if model_store is None:
+            # cada combinação de estimadores e de espaço de features tem o seu próprio artefato
+            name = 'sentiment_classifier'
+            if self.backends != DEFAULT_BACKENDS:
+                name += '_' + '_'.join(self.backends)
+            if feature_space == 'hashed':
+                name += '_hashed%i' % n_features
+            model_store = ModelStore(name)
+        self.model_store = model_store
+        self.fingerprint = self.model_store.fingerprint(dataset, {'feature_space': feature_space,
+                                                                  'n_features': n_features,
+                                                                  'backends': list(self.backends)})
+        if not load:
+            return
+
+        state = None if retrain else self.model_store.load(self.fingerprint)
+        if state is not None:
+            self.set_model_state(state)
+        else:
+            self.train_sentiment_classifiers()
+            for name, seconds in self.fit_times.items():
+                print('Trained %s in %.2fs' % (name, seconds))
+            self.save_model()
 
-    def train_sentiment_classifiers(self) -> None:
+    def create_classifiers(self) -> None:
         """
-        Função para treinar os classificadores de sentimento...
+        Função para criar os três classificadores ainda não treinados...
         :return: None
         """
 
-        # Carregando o dataset de treinamento...
-        generalTrainingData = pd.read_excel('dataset.xlsx', engine='openpyxl').fillna(' ')
+        self.classifierLRPositiveNegative = make_estimator(self.backends[0])
+        self.classifierMultinomialPositiveNeutral = make_estimator(self.backends[1])
+        self.classifierSVMNegativeNeutral = make_estimator(self.backends[2])
 
-        # Preparando os dados para o treinamento do modelo...
-        positiveNegativeTrainData = generalTrainingData[generalTrainingData['SentimentoFinal'] != 0]
-        positiveNeutralTrainData = generalTrainingData[generalTrainingData['SentimentoFinal'] != 2]
-        negativeNeutralTrainData = generalTrainingData[generalTrainingData['SentimentoFinal'] != 1]
+    def save_model(self) -> None:
+        """
+        Função para salvar o modelo treinado, junto com os radicais já calculados, no model_store...
+        :return: None
+        """
+
+        self.model_store.save(self.fingerprint, self.get_model_state())
+
+    def get_model_state(self) -> dict:
+        """
+        Função para obter os vetorizadores e classificadores treinados...
+        :return: um dicionário com os atributos treinados
+        """
+
+        state = {name: getattr(self, name) for name in self.MODEL_ATTRIBUTES}
+        state['stemCache'] = dict(self.stem_cache.entries)
+        return state
+
+    def set_model_state(self, state: dict) -> None:
+        """
+        Função para restaurar os vetorizadores e classificadores treinados...
+        :param state: um dicionário gerado por get_model_state
+        :return: None
+        """
 
-        tweetsForPositiveNegativeTrain = positiveNegativeTrainData['full_text'].values
-        tweetsForPositiveNeutralTrain = positiveNeutralTrainData['full_text'].values
-        tweetsForNegativeNeutralTrain = negativeNeutralTrainData['full_text'].values
+        for name in self.MODEL_ATTRIBUTES:
+            setattr(self, name, state[name])
+        self.stem_cache.update(state.get('stemCache', {}))
 
-        # Vetorizando os dados de treinamento...
-        vectPositiveNegativeTrain = self.vectorizerPositiveNegative.fit_transform(tweetsForPositiveNegativeTrain)
-        vectPositiveNeutralTrain = self.vectorizerPositiveNeutral.fit_transform(tweetsForPositiveNeutralTrain)
-        vectNegativeNeutralTrain = self.vectorizerNegativeNeutral.fit_transform(tweetsForNegativeNeutralTrain)
+    def build_shared_vocabulary(self) -> None:
+        """
+        Função para unir os vocabulários dos três vetorizadores em um vetorizador compartilhado...
+
+        Para cada classificador é guardado o índice, no vocabulário compartilhado, de cada coluna do seu próprio
+        vetorizador. Selecionar essas colunas da matriz compartilhada reproduz exatamente a matriz do vetorizador
+        original.
+
+        :return: None
+        """
 
-        # Obtendo as classes dos dados de treinamento...
-        classesPositiveNegativeTrain = positiveNegativeTrainData['SentimentoFinal'].values
-        classesPositiveNeutralTrain = positiveNeutralTrainData['SentimentoFinal'].values
-        classesNegativeNeutralTrain = negativeNeutralTrainData['SentimentoFinal'].values
+        terms = set(self.vectorizerPositiveNegative.vocabulary_)
+        terms.update(self.vectorizerPositiveNeutral.vocabulary_)
+        terms.update(self.vectorizerNegativeNeutral.vocabulary_)
+        vocabulary = {term: index for index, term in enumerate(sorted(terms))}
+
+        self.sharedVectorizer = CountVectorizer(analyzer="word", tokenizer=self.tweet_tokenizer.tokenize,
+                                                token_pattern=None, vocabulary=vocabulary)
+
+        def columns(vectorizer):
+            indexes = np.empty(len(vectorizer.vocabulary_), dtype=np.int64)
+            for term, column in vectorizer.vocabulary_.items():
+                indexes[column] = vocabulary[term]
+            return indexes
+
+        self.columnsPositiveNegative = columns(self.vectorizerPositiveNegative)
+        self.columnsPositiveNeutral = columns(self.vectorizerPositiveNeutral)
+        self.columnsNegativeNeutral = columns(self.vectorizerNegativeNeutral)
+
+    def train_sentiment_classifiers(self, texts=None, labels=None) -> None:
+        """
+        Função para treinar os classificadores de sentimento...
+
+        Os três classificadores são independentes, então cada um é vetorizado e treinado em um processo próprio
+        quando training_jobs é maior que 1. O tempo de cada um fica em fit_times.
+
+        :param texts: os textos de treinamento. Por padrão, os do dataset.
+        :param labels: os códigos do dataset de cada texto.
+        :return: None
+        """
+
+        # Carregando o dataset de treinamento, do cache binário quando possível...
+        if texts is None:
+            texts, labels = load_training_data(self.dataset)
+
+        # Preparando os dados para o treinamento de cada modelo, sem os tweets da classe que ele não separa...
+        hashed = self.feature_space == 'hashed'
+        tasks = []
+        for vectorizer_name, classifier_name, excluded in self.SUB_MODELS:
+            mask = labels != excluded
+            vectorizer = self.sharedVectorizer if hashed else getattr(self, vectorizer_name)
+            tasks.append((vectorizer, getattr(self, classifier_name), texts[mask], labels[mask], not hashed))
 
         # Treinando os classificadores...
-        self.classifierLRPositiveNegative.fit(vectPositiveNegativeTrain, classesPositiveNegativeTrain)
-        self.classifierMultinomialPositiveNeutral.fit(vectPositiveNeutralTrain, classesPositiveNeutralTrain)
-        self.classifierSVMNegativeNeutral.fit(vectNegativeNeutralTrain, classesNegativeNeutralTrain)
+        jobs = min(self.training_jobs, len(tasks))
+        if jobs > 1:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(jobs, mp_context=context) as pool:
+                results = list(pool.map(fit_sub_model, *zip(*tasks)))
+        else:
+            results = [fit_sub_model(*task) for task in tasks]
+
+        self.fit_times = {}
+        for (vectorizer_name, classifier_name, _), (vectorizer, classifier, seconds) in zip(self.SUB_MODELS, results):
+            if not hashed:
+                setattr(self, vectorizer_name, vectorizer)
+            setattr(self, classifier_name, classifier)
+            self.fit_times[classifier_name] = seconds
+
+        if not hashed:
+            self.build_shared_vocabulary()
 
     def preprocess_data(self, data: str) -> str:
         """
@@ -109,21 +308,14 @@ class SentimentClassifier:
         """
 
         # Limpando os dados...
-        data = re.sub(r'[^a-zA-Z0-9\s]', '', data)  # Remove caracteres especiais
-        data = re.sub(r'\d+', '', data)  # Remove números
-        data = re.sub(r'\s+', ' ', data)  # Remove espaços em branco
-        data = re.sub(r'[.?!,:;]', '', data)  # Remove pontuação
-        data = re.sub(r'http\S+|www\S+|\S+\.com\S+', '', data)  # remove links
+        data = clean_text(data)
 
         # Preparando os dados para o stemming...
         tokenized_data = self.tweet_tokenizer.tokenize(data)
 
-        # Aplicando o stemming...
-        stemmed_data = []
-        for word in tokenized_data:
-            stemmed_data += [self.text_stemmer.stem(word)]
-
-        return ' '.join(stemmed_data)
+        # Aplicando o stemming, consultando o cache antes do stemmer...
+        stem = self.stem_cache.stem
+        return ' '.join([stem(word) for word in tokenized_data])
 
     def predict(self, data: str) -> Sentiment:
         """
@@ -133,25 +325,86 @@ class SentimentClassifier:
         :return: o Sentiment encontrado na classificação
         """
 
+        return self.predict_batch([data])[0]
+
+    def vectorize_batch(self, texts: list) -> tuple:
+        """
+        Função para vetorizar um lote de tweets para os três classificadores...
+
+        :param texts: uma lista de strings com os textos dos tweets
+        :return: as matrizes dos classificadores positivo/negativo, positivo/neutro e negativo/neutro
+        """
+
         # Preparando os dados para a classificação...
-        preprocessed_data = [self.preprocess_data(data)]
+        preprocessed_data = [self.preprocess_data(text) for text in texts]
+
+        # Vetorizando os dados para a classificação uma única vez e separando as colunas de cada classificador...
+        vectors = self.sharedVectorizer.transform(preprocessed_data)
+        vectPositiveNegative = self.select_columns(vectors, self.columnsPositiveNegative)
+        vectPositiveNeutral = self.select_columns(vectors, self.columnsPositiveNeutral)
+        vectNegativeNeutral = self.select_columns(vectors, self.columnsNegativeNeutral)
+        return vectPositiveNegative, vectPositiveNeutral, vectNegativeNeutral
+
+    def predict_batch(self, texts: list) -> list:
+        """
+        Função para classificar um lote de tweets de uma só vez.
+
+        Cada vetorizador e cada classificador é chamado uma única vez por lote, e a votação entre os três
+        classificadores é resolvida de forma vetorizada, com as mesmas regras da classificação individual.
 
-        # Vetorizando os dados para a classificação...
-        vectPositiveNegative = self.vectorizerPositiveNegative.transform(preprocessed_data)
-        vectPositiveNeutral = self.vectorizerPositiveNeutral.transform(preprocessed_data)
-        vectNegativeNeutral = self.vectorizerNegativeNeutral.transform(preprocessed_data)
+        :param texts: uma lista de strings com os textos dos tweets
+        :return: uma lista com o Sentiment de cada tweet, na mesma ordem
+        """
+
+        if len(texts) == 0:
+            return []
+
+        vectPositiveNegative, vectPositiveNeutral, vectNegativeNeutral = self.vectorize_batch(texts)
 
         # Classificando os tweets...
         resultPositiveNeutral = self.classifierMultinomialPositiveNeutral.predict(vectPositiveNeutral)
         resultNegativeNeutral = self.classifierSVMNegativeNeutral.predict(vectNegativeNeutral)
         resultPositiveNegative = self.classifierLRPositiveNegative.predict(vectPositiveNegative)
 
-        # Verificando o resultado da classificação...
-        if (resultPositiveNeutral == 0).any() and (resultNegativeNeutral == 0).any():
-            return Sentiment.NEUTRAL
-        elif (resultPositiveNeutral == 1).any() and (resultPositiveNegative == 1).any():
-            return Sentiment.POSITIVE
-        elif (resultNegativeNeutral == 2).any() and (resultPositiveNegative == 2).any():
-            return Sentiment.NEGATIVE
-        else:
-            return Sentiment.NEUTRAL
+        return [Sentiment(code) for code in
+                resolve_votes(resultPositiveNeutral, resultNegativeNeutral, resultPositiveNegative)]
+
+    def predict_batch_scores(self, texts: list) -> tuple:
+        """
+        Função para classificar um lote de tweets e obter também a decisão de cada classificador.
+
+        :param texts: uma lista de strings com os textos dos tweets
+        :return: a lista com o Sentiment de cada tweet e um array (n, 3) com os valores de decisão dos
+            classificadores positivo/negativo, positivo/neutro e negativo/neutro; um valor positivo favorece o maior
+            código do dataset do par
+        """
+
+        if len(texts) == 0:
+            return [], np.empty((0, 3))
+
+        vectPositiveNegative, vectPositiveNeutral, vectNegativeNeutral = self.vectorize_batch(texts)
+
+        resultPositiveNeutral = self.classifierMultinomialPositiveNeutral.predict(vectPositiveNeutral)
+        resultNegativeNeutral = self.classifierSVMNegativeNeutral.predict(vectNegativeNeutral)
+        resultPositiveNegative = self.classifierLRPositiveNegative.predict(vectPositiveNegative)
+        scores = np.column_stack([decision_scores(self.classifierLRPositiveNegative, vectPositiveNegative),
+                                  decision_scores(self.classifierMultinomialPositiveNeutral, vectPositiveNeutral),
+                                  decision_scores(self.classifierSVMNegativeNeutral, vectNegativeNeutral)])
+
+        sentiments = [Sentiment(code) for code in
+                      resolve_votes(resultPositiveNeutral, resultNegativeNeutral, resultPositiveNegative)]
+        return sentiments, scores
+
+    @staticmethod
+    def select_columns(vectors, columns):
+        """
+        Função para obter as colunas de um classificador a partir da matriz compartilhada...
+
+        :param vectors: a matriz esparsa gerada pelo vetorizador compartilhado
+        :param columns: os índices das colunas do classificador, ou None quando ele usa todas (espaço hashed)
+        :return: a matriz esparsa com as colunas do classificador
+        """
+
+        if columns is None:
+            return vectors
+        return vectors[:, columns]
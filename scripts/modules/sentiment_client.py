@@ -0,0 +1,57 @@
+import os
+import json
+import urllib.error
+import urllib.request
+
+from .sentiment import Sentiment
+
+# written by sentiment_server.py while it is running
+SERVER_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'sentiment_server.json'))
+
+
+class SentimentClient:
+    """
+    Client of the local sentiment inference server. It has the same predict_batch interface as SentimentClassifier
+    but only needs the standard library, so callers skip importing scikit-learn and loading the model.
+    """
+
+    def __init__(self, url: str, timeout: float = 60):
+        self.url = url
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, server_file: str = SERVER_FILE):
+        """
+        Returns a client if a server is running and answering, otherwise None.
+        """
+        try:
+            with open(server_file, 'r', encoding='utf8') as f:
+                server = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        client = cls('http://%s:%i' % (server['host'], server['port']))
+        try:
+            with urllib.request.urlopen(client.url + '/health', timeout=1) as response:
+                if response.status != 200:
+                    return None
+        except (OSError, urllib.error.URLError):
+            return None
+        return client
+
+    def request(self, path: str, payload: dict) -> dict:
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode('utf8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf8'))
+
+    def predict_batch(self, texts: list) -> list:
+        if len(texts) == 0:
+            return []
+        return [Sentiment(code) for code in self.request('/classify', {'texts': list(texts)})['sentiments']]
+
+    def predict(self, data: str) -> Sentiment:
+        return self.predict_batch([data])[0]
+
+    def shutdown(self) -> None:
+        self.request('/shutdown', {})
@@ -0,0 +1,123 @@
+import os
+import json
+import struct
+import itertools
+
+from .checkpoint import sync_file
+from .sentiment import Sentiment
+
+# file layout: MAGIC, one JSON header line, then fixed-size little-endian records of
+# tweet id (uint64), Sentiment value (uint8) and, with scores, three float32 decision values
+MAGIC = b'TWSENT1\n'
+RECORD = struct.Struct('<QB')
+RECORD_SCORES = struct.Struct('<QB3f')
+
+# stored for tweets without a numeric id; such records are joined by position only
+UNKNOWN_ID = 2 ** 64 - 1
+
+EMOTIONS = {Sentiment.POSITIVE.value: 'positive', Sentiment.NEUTRAL.value: 'neutral',
+            Sentiment.NEGATIVE.value: 'negative'}
+
+
+def sidecar_path(fname) -> str:
+    return os.path.splitext(fname)[0] + '.sentiment'
+
+
+def tweet_id(tweet) -> int:
+    value = str(tweet.get('id', ''))
+    return int(value) if value.isdigit() and int(value) < UNKNOWN_ID else UNKNOWN_ID
+
+
+class SidecarWriter:
+    """
+    Writes the labels of a tweet file as a compact array of (id, emotion code[, scores]) records instead of a full
+    copy of the tweets: 9 bytes per tweet, 21 with scores.
+    """
+
+    def __init__(self, fname, scores=False, source=None, buffer_size=1024 * 1024, resume=None):
+        # resume: (size, count) from sync(); the file is cut back to size and appended to
+        self.fname = fname
+        self.scores = scores
+        self.record = RECORD_SCORES if scores else RECORD
+        if resume is None:
+            self.file = open(fname, 'wb', buffering=buffer_size)
+            self.count = 0
+            header = {'scores': scores, 'source': os.path.basename(source) if source else None}
+            self.file.write(MAGIC + json.dumps(header).encode('utf8') + b'\n')
+        else:
+            size, self.count = resume
+            with open(fname, 'r+b') as f:
+                f.truncate(size)
+            self.file = open(fname, 'ab', buffering=buffer_size)
+
+    def write(self, tweet, code, scores=None):
+        if self.scores:
+            self.file.write(self.record.pack(tweet_id(tweet), code, *scores))
+        else:
+            self.file.write(self.record.pack(tweet_id(tweet), code))
+        self.count += 1
+
+    def sync(self):
+        # returns (size, count) of the records written so far, once they are on disk
+        return sync_file(self.file), self.count
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_sidecar(fname, block_records=65536):
+    """
+    Yields (id, code, scores) for each record, scores being None when the file has none.
+    """
+    with open(fname, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a sentiment sidecar file' % fname)
+        header = json.loads(f.readline())
+        record = RECORD_SCORES if header.get('scores') else RECORD
+
+        for block in iter(lambda: f.read(record.size * block_records), b''):
+            for values in record.iter_unpack(block[:len(block) - len(block) % record.size]):
+                yield values[0], values[1], values[2:] or None
+
+
+def apply_record(tweet, record) -> None:
+    tweet['emotion'] = EMOTIONS[record[1]]
+    if record[2] is not None:
+        tweet['emotion_scores'] = list(record[2])
+
+
+def join_sidecar(tweets, fname):
+    """
+    Adds 'emotion' (and 'emotion_scores') from a sidecar file to tweets as they stream by. Records are matched by
+    position while their ids agree, which is the case for the file the sidecar was made from; after the first
+    disagreement the remaining records are indexed by id. Records and tweets without an id cannot be matched that
+    way, so past that point tweets without an id are left unlabelled.
+    """
+    records = read_sidecar(fname)
+    lookup = None
+    for tweet in tweets:
+        current_id = tweet_id(tweet)
+        if lookup is None:
+            record = next(records, None)
+            if record is not None and (record[0] == current_id or UNKNOWN_ID in (record[0], current_id)):
+                apply_record(tweet, record)
+                yield tweet
+                continue
+
+            # records without an id would all share one key
+            lookup = {}
+            if record is not None:
+                for other in itertools.chain([record], records):
+                    if other[0] != UNKNOWN_ID:
+                        lookup[other[0]] = other
+
+        record = lookup.get(current_id)
+        if record is not None:
+            apply_record(tweet, record)
+        yield tweet
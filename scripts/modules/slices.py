@@ -0,0 +1,68 @@
+import heapq
+
+
+def count_buckets(pages) -> list:
+    """
+    Returns the (start, end, tweet_count) buckets of counts_all pages in chronological order.
+    """
+    buckets = {}
+    for page in pages:
+        for bucket in page.get('data', []):
+            buckets[bucket['start']] = (bucket['start'], bucket['end'], bucket['tweet_count'])
+    return [buckets[start] for start in sorted(buckets)]
+
+
+def newest_buckets(buckets, limit) -> list:
+    """
+    Drops the oldest buckets that a search limited to limit tweets would never reach, as the search returns the
+    newest tweets first.
+    """
+    total = 0
+    for index in range(len(buckets) - 1, -1, -1):
+        total += buckets[index][2]
+        if total >= limit:
+            return buckets[index:]
+    return buckets
+
+
+def balanced_slices(buckets, n) -> list:
+    """
+    Splits consecutive buckets into at most n (start, end, tweet_count) time slices holding about the same number of
+    tweets each. A slice is never smaller than a bucket, so a single busy bucket can make one slice larger than the
+    others.
+    """
+    if not buckets:
+        return []
+
+    total = sum(bucket[2] for bucket in buckets)
+    slices = []
+    start, count, seen = buckets[0][0], 0, 0
+    for index, (bucket_start, bucket_end, tweet_count) in enumerate(buckets):
+        count += tweet_count
+        seen += tweet_count
+        last = index == len(buckets) - 1
+        # close the slice once the tweets seen so far reach its share of the total
+        if last or (len(slices) < n - 1 and seen >= total * (len(slices) + 1) / n):
+            slices.append((start, bucket_end, count))
+            if not last:
+                start, count = buckets[index + 1][0], 0
+    return slices
+
+
+def merge_by_id(streams, limit=None):
+    """
+    Merges tweet streams that are each sorted by descending id, as search results are, into one stream in the same
+    order, with each id once and at most limit tweets.
+    """
+    merged = heapq.merge(*streams, key=lambda tweet: int(tweet['id']), reverse=True)
+    last_id = None
+    written = 0
+    for tweet in merged:
+        if limit is not None and written >= limit:
+            break
+        if tweet['id'] == last_id:
+            continue
+        last_id = tweet['id']
+        written += 1
+        yield tweet
+
@@ -0,0 +1,155 @@
+import os
+import json
+import heapq
+import shutil
+import tempfile
+
+
+# rough size of one dict entry with a short string key and an int count
+BYTES_PER_ENTRY = 160
+
+# number of run files merged at once; beyond it runs are compacted first
+MAX_RUNS = 64
+
+
+class SpillCounter:
+    """
+    Exact counter that stays within a memory budget. When the in-memory dict
+    outgrows the budget its counts are written, sorted by key, to a temporary
+    run file. items() k-way merges the runs, so only one entry per run is held
+    in memory while the final counts are produced. Keys must be strings
+    without newlines.
+    """
+
+    def __init__(self, memory_budget=None, tmp_dir=None):
+        self.max_entries = max(1000, memory_budget // BYTES_PER_ENTRY) if memory_budget else None
+        self.tmp_dir = tmp_dir
+        self.run_dir = None
+        self.runs = []
+        self.run_count = 0
+        self.counts = {}
+
+    def add(self, key, count=1):
+        counts = self.counts
+        counts[key] = counts.get(key, 0) + count
+        if self.max_entries and len(counts) > self.max_entries:
+            self.spill()
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def write_run(self, items):
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(prefix='spill_', dir=self.tmp_dir)
+        path = os.path.join(self.run_dir, 'run_%i.txt' % self.run_count)
+        self.run_count += 1
+        with open(path, 'w', encoding='utf8') as f:
+            for key, count in items:
+                f.write('%s\t%i\n' % (key, count))
+        return path
+
+    def spill(self):
+        self.runs.append(self.write_run(sorted(self.counts.items())))
+        self.counts = {}
+        if len(self.runs) >= MAX_RUNS:
+            self.compact()
+
+    def compact(self):
+        runs = self.runs
+        self.runs = [self.write_run(self.merge_runs(runs))]
+        for path in runs:
+            os.remove(path)
+
+    def read_run(self, path):
+        with open(path, 'r', encoding='utf8') as f:
+            for line in f:
+                key, count = line[:-1].rsplit('\t', 1)
+                yield key, int(count)
+
+    def merge_runs(self, runs):
+        current_key = None
+        current_count = 0
+        for key, count in heapq.merge(*[self.read_run(path) for path in runs]):
+            if key == current_key:
+                current_count += count
+            else:
+                if current_key is not None:
+                    yield current_key, current_count
+                current_key = key
+                current_count = count
+        if current_key is not None:
+            yield current_key, current_count
+
+    def items(self):
+        """Yields every (key, count) pair; spilled counters yield them sorted by key."""
+        if not self.runs:
+            yield from self.counts.items()
+            return
+        if self.counts:
+            self.spill()
+        yield from self.merge_runs(self.runs)
+
+    def most_common(self, n):
+        """Top n pairs ordered by count and then key, both descending."""
+        return heapq.nlargest(n, self.items(), key=lambda k_v: (k_v[1], k_v[0]))
+
+    def close(self):
+        if self.run_dir is not None:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            self.run_dir = None
+        self.runs = []
+        self.counts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReverseSpool:
+    """
+    Sequence of JSON-serializable items read back last first. Items are
+    written in blocks of block_items to a temporary file, so only one block
+    is held in memory while adding or iterating. Tuples come back as lists.
+    """
+
+    def __init__(self, block_items=10000, tmp_dir=None):
+        self.block_items = block_items
+        self.tmp_dir = tmp_dir
+        self.file = None
+        self.offsets = []
+        self.block = []
+
+    def add(self, item):
+        self.block.append(item)
+        if len(self.block) >= self.block_items:
+            self.spill()
+
+    def spill(self):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix='spool_', dir=self.tmp_dir)
+        self.file.seek(0, os.SEEK_END)
+        self.offsets.append(self.file.tell())
+        self.file.write(json.dumps(self.block).encode('utf8') + b'\n')
+        self.block = []
+
+    def __reversed__(self):
+        yield from reversed(self.block)
+        for offset in reversed(self.offsets):
+            self.file.seek(offset)
+            yield from reversed(json.loads(self.file.readline()))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.offsets = []
+        self.block = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
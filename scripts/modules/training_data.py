@@ -0,0 +1,43 @@
+"""
+Binary cache of the parsed training dataset.
+
+    Parsing dataset.xlsx with pandas and openpyxl takes seconds on every training. The texts and labels are saved to
+    DATA/cache/datasets/<sha256 of the file>.npz the first time, and later trainings load that instead. Editing the
+    spreadsheet changes its hash, so a stale cache is never read.
+"""
+
+import os
+
+import numpy as np
+
+from .model_store import file_hash
+
+# default location: <repo>/DATA/cache/datasets
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'cache', 'datasets'))
+
+
+def parse_dataset(dataset: str):
+    # pandas is only needed when the cache misses
+    import pandas as pd
+
+    data = pd.read_excel(dataset, engine='openpyxl').fillna(' ')
+    return data['full_text'].astype(str).to_numpy(dtype=str), data['SentimentoFinal'].to_numpy(dtype=np.int64)
+
+
+def load_training_data(dataset: str, cache_dir: str = CACHE_DIR):
+    """
+    Returns (texts, labels) of the dataset as NumPy arrays, parsing the spreadsheet only on a cache miss.
+    """
+    path = os.path.join(cache_dir, file_hash(dataset) + '.npz')
+    try:
+        with np.load(path, allow_pickle=False) as cached:
+            return cached['texts'], cached['labels']
+    except (OSError, KeyError, ValueError):
+        pass
+
+    texts, labels = parse_dataset(dataset)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, texts=texts, labels=labels)
+    os.replace(tmp_path, path)
+    return texts, labels
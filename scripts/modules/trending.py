@@ -0,0 +1,130 @@
+class TrendingDetector:
+    """
+    Sliding-window trend detector for hashtags, mentions or any other keys.
+
+    Occurrences are counted in time buckets kept in a ring buffer of
+    window + baseline slots. Running totals for the recent window and for the
+    baseline window are updated as buckets rotate, so each occurrence is added,
+    moved and removed exactly once (amortized O(1) per key per tweet).
+    """
+
+    def __init__(self, bucket_seconds=3600, window=1, baseline=6, min_count=3, smoothing=1.0, limit=10):
+        if bucket_seconds <= 0 or window < 1 or baseline < 1:
+            raise ValueError('bucket_seconds and window must be positive and baseline at least 1')
+        self.bucket_seconds = bucket_seconds
+        self.window = window
+        self.baseline = baseline
+        self.min_count = min_count
+        self.smoothing = smoothing
+        self.limit = limit
+
+        self.size = window + baseline
+        self.buckets = [{} for _ in range(self.size)]
+        self.recent = {}
+        self.base = {}
+        self.current = None
+        self.elapsed = 0
+
+    def add(self, timestamp, keys):
+        """
+        Counts keys seen at timestamp (seconds since the epoch). Returns the
+        rankings of the intervals closed by this call, as a list of
+        (interval_start, ranking) pairs.
+        """
+        bucket = int(timestamp // self.bucket_seconds)
+        emitted = []
+
+        if self.current is None:
+            self.current = bucket
+        elif bucket > self.current:
+            emitted = self.advance(bucket)
+        elif self.current - bucket >= self.size:
+            # older than anything kept in the ring, nothing to update
+            return emitted
+
+        slot = self.buckets[bucket % self.size]
+        totals = self.recent if self.current - bucket < self.window else self.base
+        for key in keys:
+            slot[key] = slot.get(key, 0) + 1
+            totals[key] = totals.get(key, 0) + 1
+
+        return emitted
+
+    def advance(self, bucket):
+        emitted = []
+        # after a long silence every slot is stale; rotating more than a full ring is pointless
+        steps = bucket - self.current
+        if steps > self.size:
+            self.emit(emitted)
+            self.reset(bucket)
+            return emitted
+
+        for _ in range(steps):
+            self.emit(emitted)
+            self.current += 1
+            self.elapsed += 1
+
+            # the slot about to be reused holds the bucket leaving the baseline window
+            expired = self.buckets[self.current % self.size]
+            self.subtract(self.base, expired)
+            expired.clear()
+
+            # the bucket leaving the recent window joins the baseline
+            moved = self.buckets[(self.current - self.window) % self.size]
+            self.subtract(self.recent, moved)
+            for key, count in moved.items():
+                self.base[key] = self.base.get(key, 0) + count
+
+        return emitted
+
+    def reset(self, bucket):
+        for slot in self.buckets:
+            slot.clear()
+        self.recent.clear()
+        self.base.clear()
+        self.current = bucket
+        self.elapsed = 0
+
+    def subtract(self, totals, counts):
+        for key, count in counts.items():
+            remaining = totals[key] - count
+            if remaining:
+                totals[key] = remaining
+            else:
+                del totals[key]
+
+    def emit(self, emitted):
+        ranking = self.ranking(self.limit)
+        if ranking:
+            emitted.append((self.current * self.bucket_seconds, ranking))
+
+    def ranking(self, limit):
+        """
+        Ranks keys of the recent window by growth against the baseline window:
+        (recent rate + smoothing) / (baseline rate + smoothing), rates per bucket.
+        Returns a list of (key, score, recent_count), empty while the baseline
+        window has not seen any bucket yet.
+        """
+        baseline_buckets = min(self.baseline, self.elapsed - self.window + 1)
+        if baseline_buckets < 1:
+            return []
+
+        scored = []
+        for key, count in self.recent.items():
+            if count < self.min_count:
+                continue
+            recent_rate = count / self.window
+            base_rate = self.base.get(key, 0) / baseline_buckets
+            score = (recent_rate + self.smoothing) / (base_rate + self.smoothing)
+            if score > 1:
+                scored.append((key, score, count))
+
+        scored.sort(reverse=True, key=lambda k_s: (k_s[1], k_s[2], k_s[0]))
+        return scored[:limit]
+
+    def flush(self):
+        """Returns the ranking of the interval still open, if any."""
+        emitted = []
+        if self.current is not None:
+            self.emit(emitted)
+        return emitted
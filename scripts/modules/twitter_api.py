@@ -0,0 +1,32 @@
+import os
+
+from requests.adapters import HTTPAdapter
+
+API_URL = 'https://api.twitter.com'
+
+# bearer tokens, one per line; the gathering scripts use all of them
+KEYS_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'DATA', 'keys.txt'))
+
+# read by the gathering scripts when no --api is given, e.g. to run them against mock_twitter_api.py
+API_URL_VARIABLE = 'TWITTER_API_URL'
+
+
+def default_api_url():
+    return os.environ.get(API_URL_VARIABLE) or None
+
+
+class ApiUrlAdapter(HTTPAdapter):
+    """
+    Sends the requests a client makes to the Twitter API to another server with the same routes, such as
+    mock_twitter_api.py, when api_url is given. twarc and tweepy both have the API host built in, so the redirection
+    happens on their requests session.
+    """
+
+    def __init__(self, api_url=None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_url = api_url.rstrip('/') if api_url else None
+
+    def send(self, request, **kwargs):
+        if self.api_url is not None and request.url.startswith(API_URL):
+            request.url = self.api_url + request.url[len(API_URL):]
+        return super().send(request, **kwargs)
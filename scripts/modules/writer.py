@@ -0,0 +1,239 @@
+import os
+import gzip
+import json
+import sqlite3
+import itertools
+from abc import ABC, abstractmethod
+
+from .checkpoint import sync_file
+
+
+class TweetWriter(ABC):
+    """
+    Interface of the output sinks. Items are serialized and written a block at a time by write_many(); commit() puts
+    everything written so far on disk as a complete, readable file and returns (position, count), which a later run
+    passes back as resume=(position, count) to cut the output back to that point and carry on.
+    """
+
+    # items serialized together when write_many() gets an iterator
+    block_items = 1000
+
+    @classmethod
+    def resumable(cls, fname, position) -> bool:
+        # whether fname still holds everything up to a position commit() returned, so resume can cut it back there
+        return os.path.isfile(fname) and os.path.getsize(fname) >= position
+
+    @abstractmethod
+    def write_block(self, items) -> None:
+        ...
+
+    def write(self, item) -> None:
+        self.write_block([item])
+
+    def write_many(self, items) -> None:
+        if isinstance(items, list):
+            if items:
+                self.write_block(items)
+            return
+        iterator = iter(items)
+        for block in iter(lambda: list(itertools.islice(iterator, self.block_items)), []):
+            self.write_block(block)
+
+    @abstractmethod
+    def commit(self):
+        ...
+
+    @abstractmethod
+    def close(self) -> None:
+        ...
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonArrayWriter(TweetWriter):
+    """
+    Writes a JSON array one item per line, in the same layout the gathering
+    scripts use. Nothing is kept in memory besides the file buffer.
+
+    Each block is serialized whole and written together with the closing bracket, which the next block overwrites,
+    so a killed process leaves a complete array of the blocks written so far. A machine crash can still lose or tear
+    what was not synced; the file is valid again once cut back to a size returned by sync() or commit(), as resume
+    does.
+    """
+
+    def __init__(self, fname, buffer_size=1024 * 1024, resume=None, sort_keys=True, ensure_ascii=False):
+        # resume: (size, count) from sync() or commit(); the file is cut back to size and appended to
+        self.fname = fname
+        self.sort_keys = sort_keys
+        self.ensure_ascii = ensure_ascii
+        if resume is None:
+            self.file = open(fname, 'wb', buffering=buffer_size)
+            self.count = 0
+            self.file.write(b'[\n')
+        else:
+            size, self.count = resume
+            self.file = open(fname, 'r+b', buffering=buffer_size)
+            self.file.truncate(size)
+            self.file.seek(size)
+        self.close_array()
+
+    def close_array(self):
+        # writes the bracket and steps back over it; seeking also hands the buffered block to the OS
+        self.file.write(b']')
+        self.file.seek(-1, os.SEEK_CUR)
+
+    def write_block(self, items):
+        lines = [json.dumps(item, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii) for item in items]
+        self.file.write(((',' if self.count else '') + '\n,'.join(lines) + '\n').encode('utf8'))
+        self.count += len(lines)
+        self.close_array()
+
+    def sync(self):
+        # returns (size, count) of the items written so far, once they are on disk; size leaves out the bracket
+        return sync_file(self.file) - 1, self.count
+
+    def commit(self):
+        return self.sync()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter(TweetWriter):
+    """
+    Writes one JSON object per line (JSON Lines), which can be appended to and read without parsing the whole file.
+    """
+
+    def __init__(self, fname, buffer_size=1024 * 1024, resume=None, sort_keys=True, ensure_ascii=False):
+        self.fname = fname
+        self.sort_keys = sort_keys
+        self.ensure_ascii = ensure_ascii
+        self.file = self.open(fname, buffer_size, resume)
+
+    def open(self, fname, buffer_size, resume):
+        if resume is None:
+            self.count = 0
+            return open(fname, 'wb', buffering=buffer_size)
+        size, self.count = resume
+        with open(fname, 'r+b') as f:
+            f.truncate(size)
+        return open(fname, 'ab', buffering=buffer_size)
+
+    def serialize(self, items) -> bytes:
+        return ''.join(json.dumps(item, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii) + '\n'
+                       for item in items).encode('utf8')
+
+    def write_block(self, items):
+        self.file.write(self.serialize(items))
+        self.count += len(items)
+
+    def commit(self):
+        return sync_file(self.file), self.count
+
+    def close(self):
+        self.file.close()
+
+
+class GzipJsonLinesWriter(JsonLinesWriter):
+    """
+    JSON Lines compressed with gzip. Each commit() writes the blocks since the previous one as a gzip member of its
+    own; gzip readers take the members as one stream, and a file cut back to a commit is still a valid gzip file.
+    """
+
+    def __init__(self, fname, buffer_size=1024 * 1024, resume=None, sort_keys=True, ensure_ascii=False,
+                 compresslevel=6):
+        super().__init__(fname, buffer_size, resume, sort_keys, ensure_ascii)
+        self.compresslevel = compresslevel
+        self.pending = []
+
+    def write_block(self, items):
+        self.pending.append(self.serialize(items))
+        self.count += len(items)
+
+    def commit(self):
+        if self.pending:
+            self.file.write(gzip.compress(b''.join(self.pending), self.compresslevel))
+            self.pending = []
+        return sync_file(self.file), self.count
+
+    def close(self):
+        self.commit()
+        self.file.close()
+
+
+class SqliteWriter(TweetWriter):
+    """
+    Writes the items to the 'tweets' table of an SQLite database, with the id, creation date, author and text in
+    columns of their own and the whole item as JSON. Each commit() is a transaction; its position is the last rowid.
+    """
+
+    def __init__(self, fname, resume=None, sort_keys=True, ensure_ascii=False, **kwargs):
+        self.fname = fname
+        self.sort_keys = sort_keys
+        self.ensure_ascii = ensure_ascii
+        # the gathering engine writes from a thread of its own, one block at a time
+        self.connection = sqlite3.connect(fname, check_same_thread=False)
+        if resume is None:
+            self.connection.execute('DROP TABLE IF EXISTS tweets')
+            self.count = 0
+        else:
+            rowid, self.count = resume
+            self.connection.execute('DELETE FROM tweets WHERE rowid > ?', (rowid,))
+        self.connection.execute('CREATE TABLE IF NOT EXISTS tweets '
+                                '(id TEXT, created_at TEXT, author_id TEXT, text TEXT, data TEXT)')
+        self.connection.commit()
+
+    @classmethod
+    def resumable(cls, fname, position) -> bool:
+        if not os.path.isfile(fname):
+            return False
+        connection = sqlite3.connect(fname)
+        try:
+            rowid = connection.execute('SELECT MAX(rowid) FROM tweets').fetchone()[0]
+        except sqlite3.Error:
+            return False
+        finally:
+            connection.close()
+        return (rowid or 0) >= position
+
+    def write_block(self, items):
+        self.connection.executemany(
+            'INSERT INTO tweets VALUES (?, ?, ?, ?, ?)',
+            [(str(item.get('id')), item.get('created_at'), str(item.get('author_id')), item.get('text'),
+              json.dumps(item, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii)) for item in items])
+        self.count += len(items)
+
+    def commit(self):
+        self.connection.commit()
+        rowid = self.connection.execute('SELECT MAX(rowid) FROM tweets').fetchone()[0]
+        return rowid or 0, self.count
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+# output format of each file extension, longest first; anything else is a JSON array
+WRITERS = {'.jsonl.gz': GzipJsonLinesWriter, '.jsonl': JsonLinesWriter, '.db': SqliteWriter, '.sqlite': SqliteWriter}
+
+
+def writer_class(fname):
+    """
+    Returns the writer for the extension of fname: .jsonl, .jsonl.gz, .db or .sqlite, and a JSON array for .json and
+    the rest. Only JSON Lines can be compressed, so any other .gz name raises ValueError.
+    """
+    name = fname.lower()
+    for extension, writer in WRITERS.items():
+        if name.endswith(extension):
+            return writer
+    if name.endswith('.gz'):
+        raise ValueError('%s: only .jsonl.gz outputs are compressed' % fname)
+    return JsonArrayWriter
+
+
+def open_writer(fname, resume=None, **kwargs) -> TweetWriter:
+    return writer_class(fname)(fname, resume=resume, **kwargs)
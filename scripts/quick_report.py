@@ -1,19 +1,40 @@
 import os
 import re
 import sys
+import heapq
+import itertools
 import argparse
+from datetime import datetime, timezone
 
 sys.path.append("..")
 
 from modules.loader import Loader
 from modules.cleaner import TweetCleaner
+from modules.report_cache import ReportCache
+from modules.trending import TrendingDetector
+from modules.sketches import HyperLogLog, load_sketches, save_sketches
+from modules.spill_counter import SpillCounter, ReverseSpool
+from modules.ngrams import NgramCounter
+
+DISTINCT_LABELS = [('authors', 'Authors'), ('users', 'Mentioned users'), ('hashtags', 'Hashtags'), ('urls', 'URLs')]
+
+STOPWORDS_FILES = [os.path.abspath(os.path.join(os.path.dirname( __file__ ), 'modules', 'stopwords', 'stopwords_pt-br.txt')), os.path.abspath(os.path.join(os.path.dirname( __file__ ), 'modules', 'stopwords', 'stopwords_en.txt'))]
 
 
 def add_args():
     parser = argparse.ArgumentParser(description='Generates a summary of the data contained in a Tweet dataset.')
-    parser.add_argument('-i', '--infile', metavar='', required=True, help='Filename for the input JSON or CSV file')
+    parser.add_argument('-i', '--infile', metavar='INFILE', required=True, help='Filename for the input JSON or CSV file')
     parser.add_argument('-dc', '--displaycount', type=int, default=10, metavar='', help='Display limit for most mentioned words, users and hashtags. Default is 10.')
     parser.add_argument('-o', '--outfile', metavar='', default='report.txt', help='Filename for the resulting output. Default is "report.txt"')
+    parser.add_argument('-tr', '--trending', action='store_true', help='Add rankings of accelerating hashtags and users per time interval.')
+    parser.add_argument('-tb', '--trendbucket', type=int, default=60, metavar='', help='Length in minutes of each trending interval. Default is 60.')
+    parser.add_argument('-tw', '--trendwindow', type=int, default=1, metavar='', help='Number of intervals in the recent window. Default is 1.')
+    parser.add_argument('-tbl', '--trendbaseline', type=int, default=6, metavar='', help='Number of intervals in the baseline window the recent one is compared against. Default is 6.')
+    parser.add_argument('-ng', '--ngrams', action='store_true', help='Add bigram and trigram rankings.')
+    parser.add_argument('-nm', '--ngrammincount', type=int, default=0, metavar='', help='Prune bigrams and trigrams seen fewer times than this. Default is 0 (no pruning).')
+    parser.add_argument('-mb', '--memorybudget', type=int, metavar='', help='Memory budget in MB for each word, user and hashtag counter. Counts beyond it are spilled to temporary files and merged exactly at the end.')
+    parser.add_argument('-hs', '--hllstate', metavar='', help='File with distinct-count sketches of previous reports. This report is merged into it, giving distinct counts across files.')
+    parser.add_argument('-nc', '--nocache', action='store_true', help='Ignore cached results and recompute the summary.')
     return parser.parse_args()
 
 
@@ -36,123 +57,214 @@ def format_print_tweet(tweet, username_key):
     else:
         return '\n\t' + tweet['text'] + '\n\t' + tweet['retweets'] + ' retweets\n'
 
-def report(infile, outfile, displaycount):
+def parse_timestamp(value):
+    try:
+        date = datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    except ValueError:
+        try:
+            date = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def format_trending(title, emitted):
+    summary = '\n' + title + '\n\n'
+    for interval_start, ranking in emitted:
+        summary += '\t' + datetime.fromtimestamp(interval_start, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ') + ': '
+        summary += ', '.join('%s (%.2fx, %i)' % (key, score, count) for key, score, count in ranking) + '\n'
+    return summary
+
+
+def trending_summary(events, displaycount, trend_options):
+    hashtag_detector = TrendingDetector(bucket_seconds=trend_options['bucket'] * 60, window=trend_options['window'],
+                                        baseline=trend_options['baseline'], limit=displaycount)
+    user_detector = TrendingDetector(bucket_seconds=trend_options['bucket'] * 60, window=trend_options['window'],
+                                     baseline=trend_options['baseline'], limit=displaycount)
+    hashtag_emitted = []
+    user_emitted = []
+
+    #datasets are sorted from the most recent tweet, feed the detectors in chronological order
+    for timestamp, hashtags, users in reversed(events):
+        hashtag_emitted += hashtag_detector.add(timestamp, hashtags)
+        user_emitted += user_detector.add(timestamp, users)
+
+    hashtag_emitted += hashtag_detector.flush()
+    user_emitted += user_detector.flush()
+
+    summary = format_trending('Trending hashtags:', hashtag_emitted)
+    summary += format_trending('Trending users:', user_emitted)
+    return summary
+
+
+def format_distinct(title, sketches):
+    summary = '\n' + title + '\n\n'
+    for name, label in DISTINCT_LABELS:
+        summary += '\t%s: %i\n' % (label, sketches[name].count())
+    return summary
+
+
+def merge_distinct(sketches, hll_state):
+    if os.path.isfile(hll_state):
+        merged = load_sketches(hll_state)
+        for name, sketch in sketches.items():
+            merged[name].merge(sketch)
+    else:
+        merged = sketches
+    save_sketches(hll_state, merged)
+    return merged
+
+
+def summarize(infile, displaycount, trend_options=None, hll_state=None, memory_budget=None, ngram_options=None):
     #initialize cleaner and load stopwords
     cleaner = TweetCleaner()
-    stopwords = cleaner.load_stopwords([os.path.abspath(os.path.join(os.path.dirname( __file__ ), 'modules', 'stopwords', 'stopwords_pt-br.txt')), os.path.abspath(os.path.join(os.path.dirname( __file__ ), 'modules', 'stopwords', 'stopwords_en.txt'))])
+    stopwords = cleaner.load_stopwords(STOPWORDS_FILES)
 
-    #read file with loader module
+    #the file is streamed, so only the counters (bounded by the memory budget) grow with it
     sys.stdout.write('Reading file. This may take a while...'+"\n")
     sys.stdout.flush()
-    #print('Reading file. This may take a while...')
     loader = Loader()
-    items = loader.read_file(infile)
-    sys.stdout.write('File read successfully!\nProcessing the summary...'+"\n")
-    sys.stdout.flush()
-    #print('File read successfully!\nProcessing the summary...')
+    tweets = loader.stream_file(infile)
+    first = next(tweets, None)
 
-    if 'text' not in items[0]:
+    if first is None or 'text' not in first:
         print("Warning: 'text' key is required.\nTerminating...")
         sys.exit(0)
 
-    tweet_count = len(items)
+    date_key = 'created_at' if 'created_at' in first else 'date' if 'date' in first else None
+    username_key = get_username_key(first)
+    author_key = 'author_id' if 'author_id' in first else username_key
+    #top retweeted tweets, kept as a heap of (retweets, -position, formatted tweet)
+    top_retweeted = [] if 'retweets' in first else None
+    top_limit = min(displaycount, 10)
+    #(timestamp, hashtags, users) of each tweet are spooled to disk and replayed oldest first by the trending detectors
+    track_trends = bool(trend_options and date_key)
+    trending = ''
+
+    sketches = {name: HyperLogLog() for name, _ in DISTINCT_LABELS}
+    tweet_count = 0
+    last = first
+
+    with SpillCounter(memory_budget) as word_counter, SpillCounter(memory_budget) as hashtag_counter, \
+            SpillCounter(memory_budget) as user_counter, ReverseSpool() as trend_events:
+        ngram_counter = NgramCounter(min_count=ngram_options['min_count']) if ngram_options else None
+
+        for tweet in itertools.chain([first], tweets):
+            tweet_count += 1
+            last = tweet
+
+            if top_retweeted is not None and top_limit > 0 and 'RT @' not in tweet['text']:
+                entry = (tweet['retweets'], -tweet_count, format_print_tweet(tweet, username_key))
+                if len(top_retweeted) < top_limit:
+                    heapq.heappush(top_retweeted, entry)
+                elif entry[:2] > top_retweeted[0][:2]:
+                    heapq.heapreplace(top_retweeted, entry)
+
+            #authors and urls are taken before the text is cleaned
+            if author_key:
+                sketches['authors'].add(tweet[author_key])
+            if isinstance(tweet.get('urls'), list):
+                for url in tweet['urls']:
+                    #older gatherings keep the whole url entity
+                    if isinstance(url, dict):
+                        url = url.get('expanded_url', url.get('url'))
+                    sketches['urls'].add(url)
+            else:
+                sketches['urls'].update(re.findall(r'http\S+', tweet['text']))
+
+            text = cleaner.standardize_quotes(tweet['text'])
+            text = cleaner.clean_apostrophe_s(text)
+            text = cleaner.remove_urls(text)
+            text = cleaner.remove_symbols(text)
+            text = cleaner.remove_stopwords(text, stopwords)
+            text = cleaner.remove_emoji(text)
+            text = text.lower()
+
+            hashtags = re.findall(r'#\w+', text)
+            users = re.findall(r'@\w+', text)
+            sketches['hashtags'].update(hashtags)
+            sketches['users'].update(users)
+            hashtag_counter.update(hashtags)
+            user_counter.update(users)
+            words = re.findall(r'\b\w+', text)
+            word_counter.update(words)
+            if ngram_counter:
+                ngram_counter.add(words)
+
+            if track_trends:
+                timestamp = parse_timestamp(tweet[date_key])
+                if timestamp is not None:
+                    trend_events.add((timestamp, hashtags, users))
+
+        sys.stdout.write('File read successfully!\nProcessing the summary...'+"\n")
+        sys.stdout.flush()
+
+        summary = "File name: " + infile + '\n'
+        summary += "Tweet count: " + str(tweet_count) + "\n\n"
+
+        if date_key:
+            summary += "Most recent tweet: " + first[date_key] + "\n"
+            summary += "Oldest tweet: " + last[date_key] + "\n"
+        else:
+              summary += "Warning: 'created_at' or 'date' key does not exist. Date range information cannot be fetched."
 
-    summary = "File name: " + infile + '\n'
-    summary += "Tweet count: " + str(tweet_count) + "\n\n"
+        if top_retweeted is not None:
+            summary+='\nTop retweeted tweets:\n'
+            for _, _, formatted in sorted(top_retweeted, reverse=True):
+                summary+= formatted
 
-    if 'created_at' in items[0]:
-        #created_at exists
-        date_upper = items[0]['created_at']
-        date_lower = items[tweet_count - 1]['created_at']
+        summary+='\n\nWord ranking:\n\n'
+        for key, value in word_counter.most_common(displaycount):
+            summary+= '\t%s: %s\n' % (key, value)
 
-        summary += "Most recent tweet: " + date_upper + "\n"
-        summary += "Oldest tweet: " + date_lower + "\n"
-    elif 'date' in items[0]:
-        date_upper = items[0]['date']
-        date_lower = items[tweet_count - 1]['date']
+        summary+='\nUser ranking:\n\n'
+        for key, value in user_counter.most_common(displaycount):
+            summary+= '\t%s: %s\n' % (key, value)
 
-        summary += "Most recent tweet: " + date_upper + "\n"
-        summary += "Oldest tweet: " + date_lower + "\n"
-    else:
-          summary += "Warning: 'created_at' or 'date' key does not exist. Date range information cannot be fetched."
-
-    username_key = get_username_key(items[0])
-
-    if 'retweets' in items[0]:
-        summary+='\nTop retweeted tweets:\n'
-        cont = 0
-        for tweet in sorted(items, reverse=True, key = lambda i: i['retweets']):
-            if 'RT @' not in tweet['text'] and cont < displaycount:
-                summary+= format_print_tweet(tweet, username_key)
-                cont+=1
-            if cont>=10:
-                break
-
-
-    word_list = []
-    hashtag_list = []
-    user_list = []
-
-    for tweet in items:
-        tweet['text'] = cleaner.standardize_quotes(tweet['text'])
-        tweet['text'] = cleaner.clean_apostrophe_s(tweet['text'])
-        tweet['text'] = cleaner.remove_urls(tweet['text'])
-        tweet['text'] = cleaner.remove_symbols(tweet['text'])
-        tweet['text'] = cleaner.remove_stopwords(tweet['text'], stopwords)
-        tweet['text'] = cleaner.remove_emoji(tweet['text'])
-        tweet['text'] = tweet['text'].lower()
-
-    for tweet in items:
-        #print(re.findall(r'#\w+', tweet['text']))
-        hashtag_list += re.findall(r'#\w+', tweet['text'])
-        user_list += re.findall(r'@\w+', tweet['text'])
-        word_list += re.findall(r'\b\w+', tweet['text'])
-
-
-    word_dict = {}
-    hashtag_dict = {}
-    user_dict = {}
-
-    for hashtag in hashtag_list:
-        if hashtag in hashtag_dict:
-            hashtag_dict[hashtag] += 1
-        else:
-            hashtag_dict[hashtag] = 1
+        summary+='\nHashtag ranking:\n\n'
+        for key, value in hashtag_counter.most_common(displaycount):
+            summary+= '\t%s: %s\n' % (key, value)
 
-    for user in user_list:
-        if user in user_dict:
-            user_dict[user] += 1
-        else:
-            user_dict[user] = 1
+        if track_trends:
+            trending = trending_summary(trend_events, displaycount, trend_options)
 
-    for word in word_list:
-        if word in word_dict:
-            word_dict[word] += 1
-        else:
-            word_dict[word] = 1
+    if ngram_counter:
+        summary+='\nBigram ranking:\n\n'
+        for key, value in ngram_counter.most_common(2, displaycount):
+            summary+= '\t%s: %s\n' % (key, value)
 
+        summary+='\nTrigram ranking:\n\n'
+        for key, value in ngram_counter.most_common(3, displaycount):
+            summary+= '\t%s: %s\n' % (key, value)
 
-    summary+='\n\nWord ranking:\n\n'
-    count = 0
-    for key, value in sorted(list(word_dict.items()), reverse=True, key=lambda k_v: (k_v[1],k_v[0])):
-         if count < displaycount:
-             summary+= '\t%s: %s\n' % (key, value)
-         count +=1
+    summary += format_distinct('Distinct counts (approximate):', sketches)
+    if hll_state:
+        summary += format_distinct('Distinct counts across merged files (approximate):', merge_distinct(sketches, hll_state))
 
-    summary+='\nUser ranking:\n\n'
-    count = 0
-    for key, value in sorted(list(user_dict.items()), reverse=True, key=lambda k_v: (k_v[1],k_v[0])):
-         if count < displaycount:
-             summary+= '\t%s: %s\n' % (key, value)
-         count +=1
+    if trend_options:
+        if date_key:
+            summary += trending
+        else:
+            summary += "\nWarning: trending rankings require the 'created_at' or 'date' key.\n"
 
+    return summary
 
-    count = 0
-    summary+='\nHashtag ranking:\n\n'
-    for key, value in sorted(list(hashtag_dict.items()), reverse=True, key=lambda k_v: (k_v[1],k_v[0])):
-         if count < displaycount:
-             summary+= '\t%s: %s\n' % (key, value)
-         count +=1
+
+def report(infile, outfile, displaycount, use_cache=True, trend_options=None, hll_state=None, memory_budget=None, ngram_options=None):
+    cache = ReportCache()
+    key = cache.make_key(infile, STOPWORDS_FILES, displaycount=displaycount, trending=trend_options, ngrams=ngram_options)
+
+    #merging into a sketch file must always run, so it bypasses the cache
+    summary = cache.get(key) if use_cache and not hll_state else None
+    if summary is not None:
+        sys.stdout.write('Summary found in cache.'+"\n")
+        sys.stdout.flush()
+    else:
+        summary = summarize(infile, displaycount, trend_options, hll_state, memory_budget, ngram_options)
+        if not hll_state:
+            cache.put(key, summary)
 
     with open(outfile, 'w', encoding='utf8') as f:
         f.write(summary)
@@ -164,7 +276,14 @@ def report(infile, outfile, displaycount):
 
 def main(args):
     #args = add_args()
-    report(args.infile, args.outfile, args.displaycount)
+    trend_options = None
+    if args.trending:
+        trend_options = {'bucket': args.trendbucket, 'window': args.trendwindow, 'baseline': args.trendbaseline}
+    ngram_options = None
+    if args.ngrams:
+        ngram_options = {'min_count': args.ngrammincount}
+    memory_budget = args.memorybudget * 1024 * 1024 if args.memorybudget else None
+    report(args.infile, args.outfile, args.displaycount, not args.nocache, trend_options, args.hllstate, memory_budget, ngram_options)
 
 if __name__== "__main__":
     args = add_args()
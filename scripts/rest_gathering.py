@@ -8,24 +8,45 @@
 import os
 import sys
 import argparse
-import json
 import datetime
 import logging
 
 from twarc.client2 import Twarc2
 from twarc.expansions import ensure_flattened
 
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-def get_key():
-    p = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'DATA', 'keys.txt'))
-    with open(p, 'r') as arq:
-        chave = arq.read().splitlines()[0]
-    return chave
+from scripts.modules.checkpoint import Checkpoint
+from scripts.modules.credentials import CredentialPool, mount_pool
+from scripts.modules.gathering import GatheringEngine
+from scripts.modules.loader import Loader
+from scripts.modules.slices import balanced_slices, count_buckets, merge_by_id, newest_buckets
+from scripts.modules.twitter_api import KEYS_FILE, default_api_url
+from scripts.modules.progress import CollectedCounter
+from scripts.modules.writer import JsonArrayWriter, open_writer, writer_class
 
+TWEET_FIELDS = "attachments,created_at,lang,author_id,public_metrics,entities"
 
-def authenticate():
-    key = get_key()
-    return Twarc2(bearer_token=key)
+
+class ApiTwarc2(Twarc2):
+    """
+    Twarc2 whose sessions send their requests through a CredentialPool, to api_url when given.
+    """
+
+    def __init__(self, pool, api_url=None, **kwargs):
+        # Twarc2.__init__ already connects
+        self.pool = pool
+        self.api_url = api_url
+        super().__init__(bearer_token=pool.keys[0], **kwargs)
+
+    def connect(self):
+        super().connect()
+        mount_pool(self.client, self.pool, self.api_url)
+
+
+def authenticate(pool=None, api_url=None):
+    return ApiTwarc2(pool or CredentialPool.from_file(KEYS_FILE), api_url)
 
 
 def date_check(since, until):
@@ -35,94 +56,266 @@ def date_check(since, until):
         sys.exit(0)
 
 
-def collect_tweets(args, twarc):
-    arq = open(args.outfile, 'w')
-    arq.write("[\n")
-    counter = 1
-
-    if 'lang:' not in args.query:
-        args.query = '(' + args.query + ')'
-        if args.language == 'pt and en':
-            args.query += ' (lang:pt OR lang:en)'
-        elif args.language != 'None':
-            args.query += ' lang:' + args.language
-
-    search_count = twarc.counts_all(args.query, start_time=args.start_time, end_time=args.end_time)
-    for page in search_count:
-        search_count = page['meta']['total_tweet_count']
-        break
-
-    if search_count == 0:
-        sys.stdout.write('\nThere are no tweets to collect. Finishing...')
-        return
-    elif search_count > args.maxtweets:
+def build_query(query, language):
+    if 'lang:' not in query:
+        query = '(' + query + ')'
+        if language == 'pt and en':
+            query += ' (lang:pt OR lang:en)'
+        elif language != 'None':
+            query += ' lang:' + language
+    return query
+
+
+def format_tweet(tweet):
+    tweet_id = tweet['id']
+    text = tweet['text']
+    created_at = tweet['created_at']
+    lang = tweet['lang']
+    author_id = tweet['author_id']
+    rt_count = tweet['public_metrics']['retweet_count']
+
+    urls = []
+    people_cited = []
+    probability = 0.70  # add entities with 70% probability or more to be a person
+
+    if 'entities' in tweet:
+        if 'urls' in tweet['entities']:
+            for url in tweet['entities']['urls']:
+                urls.append(url['url'])
+
+        if 'annotations' in tweet['entities']:
+            for annotation in tweet['entities']['annotations']:
+                if annotation['type'] == 'Person' and annotation['probability'] >= probability:
+                    people_cited.append(annotation['normalized_text'])
+
+    has_rich_media = False
+    if 'attachments' in tweet:
+        if 'media_keys' in tweet['attachments'] or 'poll_ids' in tweet['attachments']:
+            has_rich_media = True
+
+    line = {
+        'id': tweet_id,
+        'text': text,
+        'created_at': created_at,
+        'lang': lang,
+        'author_id': author_id,
+        'retweet_count': rt_count,
+        'urls': urls,
+        'people_cited': people_cited,
+        'has_rich_media': has_rich_media
+    }
+    line['created_at'] = datetime.datetime.strptime(line['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ').strftime(
+        '%Y-%m-%dT%H:%M:%SZ')
+    return line
+
+
+def load_checkpoint(checkpoint, search):
+    state = checkpoint.load()
+    if state is None:
+        sys.stdout.write('\nNo checkpoint found for this output, starting from the beginning...')
+    elif any(state.get(key) != value for key, value in search.items()):
+        sys.stdout.write('\nThe checkpoint of this output is from another search, starting from the beginning...')
+        state = None
+    return state
+
+
+def output_resumable(state, outfile, writer) -> bool:
+    # the output must still hold everything the checkpoint counts, or resuming would leave it broken
+    if writer.resumable(outfile, state['output_position']):
+        return True
+    sys.stdout.write('\n%s is missing or shorter than its checkpoint, starting it from the beginning...' % outfile)
+    return False
+
+
+def transform_page(page):
+    return [format_tweet(tweet) for tweet in ensure_flattened(page)]
+
+
+class SearchOutput:
+    """
+    Writes up to maxtweets results of search (query, start_time and end_time) to outfile, continuing from state, a
+    checkpoint of an earlier run, when given. It is the sink of the search in a GatheringEngine; each page is written
+    as one block through the writer open_writer picks for outfile.
+    """
+
+    def __init__(self, search, outfile, maxtweets, state=None, counter=None, opener=open_writer):
+        # after every page the output is committed as a complete file and the checkpoint records the token of the
+        # next page, how many tweets the output holds, the id of the last one and the output position of the commit
+        self.search = search
+        self.maxtweets = maxtweets
+        self.checkpoint = Checkpoint(outfile + '.checkpoint')
+        self.counter = counter or CollectedCounter()
+        if state is None:
+            self.writer = opener(outfile, sort_keys=False, ensure_ascii=True)
+            self.writer.commit()
+            self.next_token = None
+            self.last_id = None
+        else:
+            self.writer = opener(outfile, resume=(state['output_position'], state['tweets']), sort_keys=False,
+                                 ensure_ascii=True)
+            self.next_token = state['next_token']
+            self.last_id = state['last_id']
+            self.counter.add(state['tweets'])
+        self.complete = self.writer.count >= maxtweets
+
+    def pages(self, twarc):
+        # the engine asks for the next page before this one is written, so the search stops itself once the pages
+        # fetched hold every tweet still wanted, instead of spending a request on a page that would be thrown away
+        if self.complete:
+            return
+        wanted = self.maxtweets - self.writer.count
+        for page in twarc.search_all(query=self.search['query'], start_time=self.search['start_time'],
+                                     end_time=self.search['end_time'], tweet_fields=TWEET_FIELDS, max_results=500,
+                                     next_token=self.next_token):
+            yield page
+            wanted -= len(page.get('data', []))
+            if wanted <= 0:
+                return
+
+    def write_page(self, page, lines):
+        lines = lines[:self.maxtweets - self.writer.count]
+        if lines:
+            self.writer.write_many(lines)
+            self.last_id = lines[-1]['id']
+            self.counter.add(len(lines))
+
+        position, count = self.writer.commit()
+        self.next_token = page['meta'].get('next_token')
+        if count >= self.maxtweets or self.next_token is None:
+            self.complete = True
+            return False
+        self.checkpoint.save(dict(self.search, next_token=self.next_token, tweets=count, last_id=self.last_id,
+                                  output_position=position))
+        return True
+
+    def close(self, finished=True):
+        # an interrupted search keeps its checkpoint
+        self.writer.close()
+        if finished:
+            self.checkpoint.clear()
+
+
+def report_count(search_count, maxtweets):
+    if search_count > maxtweets:
         sys.stdout.write('\nThe search resulted aproximately in %i tweets. Collecting %i of them...' % (
-        search_count, args.maxtweets))
+        search_count, maxtweets))
     else:
         sys.stdout.write('\nThe search resulted aproximately in %i tweets. Collecting all of them...' % search_count)
 
-    search_results = twarc.search_all(query=args.query, start_time=args.start_time, end_time=args.end_time,
-                                      tweet_fields="attachments,created_at,lang,author_id,public_metrics,entities",
-                                      max_results=500)
-
-    for page in search_results:
-        for tweet in ensure_flattened(page):
-            tweet_id = tweet['id']
-            text = tweet['text']
-            created_at = tweet['created_at']
-            lang = tweet['lang']
-            author_id = tweet['author_id']
-            rt_count = tweet['public_metrics']['retweet_count']
-
-            urls = []
-            people_cited = []
-            probability = 0.70  # add entities with 70% probability or more to be a person
-
-            if 'entities' in tweet:
-                if 'urls' in tweet['entities']:
-                    for url in tweet['entities']['urls']:
-                        urls.append(url['url'])
-
-                if 'annotations' in tweet['entities']:
-                    for annotation in tweet['entities']['annotations']:
-                        if annotation['type'] == 'Person' and annotation['probability'] >= probability:
-                            people_cited.append(annotation['normalized_text'])
-
-            has_rich_media = False
-            if 'attachments' in tweet:
-                if 'media_keys' in tweet['attachments'] or 'poll_ids' in tweet['attachments']:
-                    has_rich_media = True
-
-            line = {
-                'id': tweet_id,
-                'text': text,
-                'created_at': created_at,
-                'lang': lang,
-                'author_id': author_id,
-                'retweet_count': rt_count,
-                'urls': urls,
-                'people_cited': people_cited,
-                'has_rich_media': has_rich_media
-            }
-            line['created_at'] = datetime.datetime.strptime(line['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ').strftime(
-                '%Y-%m-%dT%H:%M:%SZ')
-
-            if counter == 1:
-                arq.write(json.dumps(line) + '\n')
-            elif counter >= args.maxtweets:
-                break
-            else:
-                arq.write(',' + json.dumps(line) + '\n')
-
-            sys.stdout.write("\rNumber of tweets collected so far...: %i" % counter)
-            sys.stdout.flush()
-            counter += 1
-
-        if counter >= args.maxtweets:
+
+def write_empty(outfile):
+    with open_writer(outfile, sort_keys=False, ensure_ascii=True):
+        pass
+    sys.stdout.write('\nThere are no tweets to collect. Finishing...')
+
+
+def collect_sliced(args, twarc, search):
+    """
+    Splits the search period into args.slices time slices of about the same volume, going by the hourly counts, and
+    fetches them concurrently into <outfile>.part<i> files, which are merged into outfile by descending id. The
+    slices are planned in <outfile>.slices.checkpoint and each part keeps its own page checkpoint, so --resume picks
+    the run up where each slice stopped.
+    """
+    plan = Checkpoint(args.outfile + '.slices.checkpoint')
+    state = load_checkpoint(plan, search) if args.resume else None
+    if state is None:
+        # datetimes, as twarc compares the start time with the buckets to tell whether the counts are complete
+        buckets = count_buckets(twarc.counts_all(
+            args.query, start_time=datetime.datetime.strptime(args.start_time, '%Y-%m-%dT%H:%M:%SZ'),
+            end_time=datetime.datetime.strptime(args.end_time, '%Y-%m-%dT%H:%M:%SZ')))
+        search_count = sum(bucket[2] for bucket in buckets)
+        if search_count == 0:
+            write_empty(args.outfile)
+            return
+        report_count(search_count, args.maxtweets)
+
+        # a limited search only reaches the newest tweets, so only their buckets are sliced
+        slices = balanced_slices(newest_buckets(buckets, args.maxtweets), args.slices)
+        state = dict(search, slices=slices, done={})
+        plan.save(state)
+    else:
+        sys.stdout.write('\nResuming %i of %i slices...' % (len(state['slices']) - len(state['done']),
+                                                            len(state['slices'])))
+
+    parts = ['%s.part%i' % (args.outfile, index) for index in range(len(state['slices']))]
+    for index, part in enumerate(parts):
+        # a finished slice whose part is gone is fetched again
+        if str(index) in state['done'] and not os.path.isfile(part):
+            sys.stdout.write('\n%s is missing, starting it from the beginning...' % part)
+            del state['done'][str(index)]
+    counter = CollectedCounter()
+    if state['done']:
+        counter.add(sum(state['done'].values()))
+
+    outputs = {}
+    for index in range(len(parts)):
+        if str(index) in state['done']:
+            continue
+        start_time, end_time, _ = state['slices'][index]
+        part_search = dict(search, start_time=start_time, end_time=end_time)
+        part_state = Checkpoint(parts[index] + '.checkpoint').load()
+        if part_state is not None and any(part_state.get(key) != value for key, value in part_search.items()):
+            part_state = None
+        if part_state is not None and not output_resumable(part_state, parts[index], JsonArrayWriter):
+            part_state = None
+        # the parts stay JSON arrays, whatever the output format, to be merged
+        outputs[index] = SearchOutput(part_search, parts[index], args.maxtweets, part_state, counter, JsonArrayWriter)
+
+    # one client per slice, as twarc keeps per-request state on the client, all drawing on the same keys
+    engine = GatheringEngine(transform_page, args.concurrency or len(outputs), queue_size=args.queuesize)
+    finished = False
+    try:
+        engine.run([(output.pages(authenticate(twarc.pool, args.api)), output.write_page)
+                    for output in outputs.values()])
+        finished = True
+    finally:
+        for index, output in outputs.items():
+            output.close(finished or output.complete)
+            if finished or output.complete:
+                state['done'][str(index)] = output.writer.count
+        plan.save(state)
+
+    sys.stdout.write('\nMerging %i slices...' % len(parts))
+    counter.finish()
+    with open_writer(args.outfile, sort_keys=False, ensure_ascii=True) as writer:
+        writer.write_many(merge_by_id([Loader().stream_json(part) for part in parts], args.maxtweets))
+    for part in parts:
+        os.remove(part)
+    plan.clear()
+    sys.stdout.write('\n%i tweets written. All done! Finishing...' % writer.count)
+
+
+def collect_tweets(args, twarc):
+    args.query = build_query(args.query, args.language)
+    search = {'query': args.query, 'start_time': args.start_time, 'end_time': args.end_time}
+    if args.slices > 1:
+        collect_sliced(args, twarc, search)
+        return
+
+    state = load_checkpoint(Checkpoint(args.outfile + '.checkpoint'), search) if args.resume else None
+    if state is not None and not output_resumable(state, args.outfile, writer_class(args.outfile)):
+        state = None
+    if state is None:
+        search_count = twarc.counts_all(args.query, start_time=args.start_time, end_time=args.end_time)
+        for page in search_count:
+            search_count = page['meta']['total_tweet_count']
             break
 
-    arq.write("]")
-    arq.close()
+        if search_count == 0:
+            write_empty(args.outfile)
+            return
+        report_count(search_count, args.maxtweets)
+    else:
+        sys.stdout.write('\nResuming after %i tweets...' % state['tweets'])
+
+    output = SearchOutput(search, args.outfile, args.maxtweets, state)
+    finished = False
+    try:
+        GatheringEngine(transform_page, queue_size=args.queuesize).run([(output.pages(twarc), output.write_page)])
+        finished = True
+    finally:
+        output.close(finished)
+        output.counter.finish()
     sys.stdout.write('\nAll done! Finishing...')
 
 
@@ -132,12 +325,30 @@ def setup_logging():
 
 def add_args():
     parser = argparse.ArgumentParser(description='Coleta tweets de acordo com a query, data e limites.')
-    parser.add_argument('-q', '--query', metavar='', required=True)
-    parser.add_argument('-s', '--start_time', metavar='', required=True, help='"YYYY-MM-DDTHH:mmZ"  UTC')
-    parser.add_argument('-u', '--end_time', metavar='', required=True, help='"YYYY-MM-DDTHH:mmZ" UTC')
+    parser.add_argument('-q', '--query', metavar='QUERY', required=True)
+    parser.add_argument('-s', '--start_time', metavar='START', required=True, help='"YYYY-MM-DDTHH:mmZ"  UTC')
+    parser.add_argument('-u', '--end_time', metavar='END', required=True, help='"YYYY-MM-DDTHH:mmZ" UTC')
     parser.add_argument('-m', '--maxtweets', metavar='', type=int, default=100)
     parser.add_argument('-l', '--language', metavar='')
-    parser.add_argument('-o', '--outfile', metavar='', default="output.json")
+    parser.add_argument('-o', '--outfile', metavar='', default="output.json",
+                        help='JSON array by default; .jsonl, .jsonl.gz, .db and .sqlite write JSON Lines, gzipped '
+                             'JSON Lines or an SQLite table instead')
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help='Continue the search of an interrupted run from its checkpoint, <outfile>.checkpoint')
+    parser.add_argument('-k', '--keys', metavar='', default=KEYS_FILE,
+                        help='File with one bearer token per line; requests are spread over all of them. '
+                             'Default is DATA/keys.txt')
+    parser.add_argument('-a', '--api', metavar='', default=default_api_url(),
+                        help='Base URL of the API, e.g. http://127.0.0.1:8770 for mock_twitter_api.py. Default is '
+                             'the Twitter API, or $TWITTER_API_URL when set')
+    parser.add_argument('-p', '--slices', metavar='', type=int, default=1,
+                        help='Split the period into this many slices of about the same volume and fetch them '
+                             'concurrently. Default is 1')
+    parser.add_argument('-c', '--concurrency', metavar='', type=int, default=None,
+                        help='Slices fetched at the same time. Default is all of them')
+    parser.add_argument('-Q', '--queuesize', metavar='', type=int, default=8,
+                        help='Pages held between the fetch, transform and write stages before fetching waits. '
+                             'Default is 8')
     return parser.parse_args()
 
 
@@ -145,12 +356,18 @@ def main():
     setup_logging()
     args = add_args()
 
+    try:
+        writer_class(args.outfile)
+    except ValueError as error:
+        sys.stdout.write('%s\nQuitting...' % error)
+        return
+
     date_check(datetime.datetime.strptime(args.start_time, '%Y-%m-%dT%H:%MZ'),
                datetime.datetime.strptime(args.end_time, '%Y-%m-%dT%H:%MZ'))
     args.start_time = args.start_time[:-1] + ':00Z'
     args.end_time = args.end_time[:-1] + ':00Z'
 
-    twarc = authenticate()
+    twarc = authenticate(CredentialPool.from_file(args.keys), args.api)
     collect_tweets(args, twarc)
 
 
@@ -1,32 +1,66 @@
+import os
 import sys
+import time
 import argparse
-import json
 import pathlib
+import itertools
+import collections
+import multiprocessing
 
-from scripts.modules.sentiment_classifier import SentimentClassifier, Sentiment
+# the GUI runs this file directly, so the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-sys.path.append("..")
+from scripts.modules.sentiment import Sentiment
+from scripts.modules.sentiment_client import SentimentClient
+from scripts.modules.compact_model import COMPACT_MODEL_FILE, CompactSentimentModel
+from scripts.modules.checkpoint import Checkpoint
+from scripts.modules.dedup import TextDeduplicator
+from scripts.modules.loader import Loader
+from scripts.modules.progress import ProgressReporter
+from scripts.modules.sidecar import SidecarWriter, sidecar_path
+from scripts.modules.writer import JsonArrayWriter
 
 
 def add_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description='Classify tweets as positive, negative, or neutral with machine learning techniques.')
-    parser.add_argument('-i', '--infile', metavar='', required=True,
+    parser.add_argument('-i', '--infile', metavar='INFILE', required=True,
                         help='Input JSON file to be cleaned. Has to contain a key named text')
     parser.add_argument('-o', '--outfile', metavar='', default='output_clean.json',
                         help='Filename for the resulting output. Default is "output_clean" in the input file '
                              'extension format')
+    parser.add_argument('-b', '--batchsize', metavar='', type=int, default=1000,
+                        help='Number of tweets classified at once. Default is 1000')
+    parser.add_argument('-j', '--jobs', metavar='', type=int, default=1,
+                        help='Number of worker processes classifying batches in parallel. Default is 1')
+    parser.add_argument('-ns', '--noserver', action='store_true',
+                        help='Load the model in this process even if the sentiment server is running')
+    parser.add_argument('-r', '--retrain', action='store_true',
+                        help='Retrain the classifiers even if a saved model matches the training dataset')
+    parser.add_argument('-c', '--compact', metavar='', nargs='?', const=COMPACT_MODEL_FILE, default=None,
+                        help='Predict with a NumPy bundle written by export_sentiment_model.py instead of '
+                             'scikit-learn. Default bundle is DATA/models/sentiment_compact.npz')
+    parser.add_argument('-be', '--backends', metavar='', default=None,
+                        help='Comma-separated estimators of the positive/negative, positive/neutral and '
+                             'negative/neutral classifiers, e.g. linearsvc,complementnb,linearsvc. '
+                             'Default is lr,nb,svc')
+    parser.add_argument('-dd', '--dedup', action='store_true',
+                        help='Classify each distinct text once and copy its label to the repeated ones (retweets)')
+    parser.add_argument('-on', '--online', action='store_true',
+                        help='Use the latest version of the incrementally trained model (update_sentiment_model.py)')
+    parser.add_argument('-sc', '--sidecar', metavar='', nargs='?', const='', default=None,
+                        help='Write only tweet ids and labels to a compact .sentiment file instead of a labelled '
+                             'copy of the input. Default path is the input file with a .sentiment extension')
+    parser.add_argument('-ss', '--scores', action='store_true',
+                        help='Also write the decision value of each of the three classifiers')
+    parser.add_argument('-re', '--resume', action='store_true',
+                        help='Continue an interrupted run from its last checkpoint (<outfile>.checkpoint)')
+    parser.add_argument('-ci', '--checkpointinterval', metavar='', type=float, default=30,
+                        help='Seconds between checkpoints of the output written so far. Default is 30')
     return parser.parse_args()
 
 
-def write_json(outfile, data) -> None:
-    json_string = json.dumps(data, sort_keys=True, indent=4, ensure_ascii=False)
-    with open(outfile, 'w', encoding='utf8') as f:
-        f.write(json_string)
-    sys.stdout.write('All done. File written to ' + outfile)
-
-
-def write_file(infile, outfile, data) -> None:
+def output_path(infile, outfile):
     if outfile != 'output_sentiments.json':
         extension = pathlib.Path(outfile).suffix
     else:
@@ -34,54 +68,226 @@ def write_file(infile, outfile, data) -> None:
         outfile = 'output_clean' + extension
 
     if extension == '.json':
-        write_json(outfile, data)
-    else:
-        sys.stdout.write('Output file must be in JSON format\nQuitting...')
+        return outfile
+    return None
+
+
+def read_batches(tweets, batch_size):
+    batch = list(itertools.islice(tweets, batch_size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(tweets, batch_size))
+
+
+# classifier used by pool workers; forked workers inherit it copy-on-write instead of loading it again
+worker_classifier = None
+
+
+def init_worker(compact=None, online=False, backends=None) -> None:
+    global worker_classifier
+    if worker_classifier is None:
+        # spawned workers (e.g. on Windows) load the saved model once each
+        if compact is not None:
+            worker_classifier = CompactSentimentModel(compact)
+            return
+        if online:
+            from scripts.modules.online_classifier import OnlineSentimentClassifier
+            worker_classifier = OnlineSentimentClassifier()
+            return
+        from scripts.modules.sentiment_classifier import SentimentClassifier, DEFAULT_BACKENDS
+        worker_classifier = SentimentClassifier(backends=backends or DEFAULT_BACKENDS)
+
+
+def classify_texts(texts, scores=False) -> list:
+    if scores:
+        sentiments, values = worker_classifier.predict_batch_scores(texts)
+        return [(sentiment.value, row) for sentiment, row in zip(sentiments, values.tolist())]
+    return [sentiment.value for sentiment in worker_classifier.predict_batch(texts)]
+
+
+def classify_batches(classifier, batches, jobs=1, dedup=None, scores=False):
+    """
+    Yields (batch, sentiments) for each batch of tweets, in input order. With more than one job the batches are
+    classified by a process pool, keeping at most two batches per worker in flight. With a TextDeduplicator only the
+    texts it has not labelled yet are classified. With scores each sentiment comes as (sentiment, decision values).
+    """
+    def split(batch):
+        texts = [tweet['text'] for tweet in batch]
+        if dedup is None:
+            return texts, None
+        plan = dedup.plan(texts)
+        return plan[3], plan
+
+    def join(plan, sentiments):
+        return sentiments if plan is None else dedup.resolve(plan, sentiments)
+
+    def decode(result):
+        if scores:
+            return [(Sentiment(code), row) for code, row in result]
+        return [Sentiment(code) for code in result]
+
+    if jobs <= 1:
+        for batch in batches:
+            texts, plan = split(batch)
+            if scores:
+                sentiments, values = classifier.predict_batch_scores(texts)
+                yield batch, join(plan, list(zip(sentiments, values.tolist())))
+            else:
+                yield batch, join(plan, classifier.predict_batch(texts))
+        return
+
+    global worker_classifier
+    worker_classifier = classifier
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
 
+    compact = classifier.path if isinstance(classifier, CompactSentimentModel) else None
+    online = type(classifier).__name__ == 'OnlineSentimentClassifier'
+    backends = getattr(classifier, 'backends', None)
+    with context.Pool(jobs, initializer=init_worker, initargs=(compact, online, backends)) as pool:
+        pending = collections.deque()
+        for batch in batches:
+            texts, plan = split(batch)
+            pending.append((batch, plan, pool.apply_async(classify_texts, (texts, scores))))
+            if len(pending) >= 2 * jobs:
+                done, plan, result = pending.popleft()
+                yield done, join(plan, decode(result.get()))
+
+        while pending:
+            done, plan, result = pending.popleft()
+            yield done, join(plan, decode(result.get()))
+
+
+def load_classifier(retrain=False, use_server=True, compact=None, online=False, backends=None):
+    if compact is not None:
+        print('Loading compact model...')
+        return CompactSentimentModel(compact)
+
+    if online:
+        from scripts.modules.online_classifier import OnlineSentimentClassifier
+
+        print('Loading online model...')
+        return OnlineSentimentClassifier(retrain=retrain)
+
+    # the server always uses the default estimators
+    if use_server and not retrain and backends is None:
+        client = SentimentClient.connect()
+        if client is not None:
+            print('Using the running sentiment server...')
+            return client
+
+    # importing scikit-learn and loading the model is what the server saves
+    from scripts.modules.sentiment_classifier import SentimentClassifier
 
-def predict(infile, outfile) -> None:
     print('Loading model...')
-    classifier = SentimentClassifier()
+    if backends is None:
+        return SentimentClassifier(retrain=retrain)
+    return SentimentClassifier(retrain=retrain, backends=backends)
+
+
+def predict(infile, outfile, retrain=False, batch_size=1000, jobs=1, use_server=True, compact=None,
+            online=False, backends=None, dedup=False, sidecar=None, scores=False, resume=False,
+            checkpoint_interval=30) -> None:
+    if sidecar is not None:
+        outfile = sidecar or sidecar_path(infile)
+    else:
+        outfile = output_path(infile, outfile)
+        if outfile is None:
+            sys.stdout.write('Output file must be in JSON format\nQuitting...')
+            return
+
+    # the server only returns labels
+    classifier = load_classifier(retrain, use_server and not scores, compact, online, backends)
+    local = not isinstance(classifier, (SentimentClient, CompactSentimentModel))
+    # stems computed from here on are new to the saved model
+    stems_before = classifier.stem_cache.misses if local else 0
+
+    # the checkpoint holds how many input tweets are labelled and how much of the output holds them
+    checkpoint = Checkpoint(outfile + '.checkpoint')
+    run = {'infile': os.path.abspath(infile), 'input_size': os.path.getsize(infile),
+           'sidecar': sidecar is not None, 'scores': scores}
+    state = checkpoint.load() if resume else None
+    if resume and state is None:
+        print('No checkpoint found for %s, starting from the beginning...' % outfile)
+    elif state is not None and any(state.get(key) != value for key, value in run.items()):
+        print('The checkpoint of %s is from another input or options, starting from the beginning...' % outfile)
+        state = None
+    elif state is not None and (not os.path.isfile(outfile) or os.path.getsize(outfile) < state['output_bytes']):
+        print('%s is missing or shorter than its checkpoint, starting from the beginning...' % outfile)
+        state = None
+    resume_at = (state['output_bytes'], state['tweets']) if state is not None else None
 
     print('Loading data...')
-    with open(infile, 'r', encoding='utf8') as f:
-        data = json.load(f)
+    loader = Loader()
+    tweets = loader.stream_file(infile)
+    if resume_at is not None:
+        # tweets before the checkpoint are parsed again but not classified; output past it is cut off
+        collections.deque(itertools.islice(tweets, state['tweets']), maxlen=0)
+        print('Resuming after %i tweets...' % state['tweets'])
+    progress = ProgressReporter(os.path.getsize(infile))
+    deduplicator = TextDeduplicator() if dedup else None
+
+    if sidecar is not None:
+        writer = SidecarWriter(outfile, scores, infile, resume=resume_at)
+    else:
+        writer = JsonArrayWriter(outfile, resume=resume_at)
+
+    def save_checkpoint():
+        size, count = writer.sync()
+        checkpoint.save(dict(run, tweets=count, output_bytes=size))
 
-    new_data = []
+    last_checkpoint = time.monotonic()
 
-    count = 0
-    for tweet in data:
-        # Inform user of progress
-        print('Processing tweet ' + str(count) + ' of ' + str(len(data)))
-        count += 1
+    with writer:
+        batches = read_batches(tweets, batch_size)
+        for batch, results in classify_batches(classifier, batches, jobs, deduplicator, scores):
+            for tweet, result in zip(batch, results):
+                sentiment, values = result if scores else (result, None)
+                if sidecar is not None:
+                    writer.write(tweet, sentiment.value, values)
+                    continue
 
-        # Get text from tweet and predict sentiment
-        text = tweet['text']
-        sentiment: Sentiment = classifier.predict(text)
+                # Add sentiment to the tweet as it was read
+                if sentiment == Sentiment.POSITIVE:
+                    tweet['emotion'] = 'positive'
+                if sentiment == Sentiment.NEUTRAL:
+                    tweet['emotion'] = 'neutral'
+                if sentiment == Sentiment.NEGATIVE:
+                    tweet['emotion'] = 'negative'
+                if values is not None:
+                    tweet['emotion_scores'] = values
 
-        # Create new tweet extracting the values from array
-        # When adding a new value to an existing JSON dictionary, all other values turn into arrays
-        # This is a workaround to avoid that
-        new_tweet = {}
-        for value in tweet:
-            new_tweet[value] = tweet[value]
+            if sidecar is None:
+                writer.write_many(batch)
 
-        # Add sentiment to new tweet
-        if sentiment == Sentiment.POSITIVE:
-            new_tweet['emotion'] = 'positive'
-        if sentiment == Sentiment.NEUTRAL:
-            new_tweet['emotion'] = 'neutral'
-        if sentiment == Sentiment.NEGATIVE:
-            new_tweet['emotion'] = 'negative'
+            if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                save_checkpoint()
+                last_checkpoint = time.monotonic()
 
-        new_data.append(new_tweet)
+            # Inform user of progress
+            progress.update(writer.count, loader.bytes_read())
 
-    write_file(infile, outfile, new_data)
+    checkpoint.clear()
+    progress.finish()
+    if deduplicator is not None and deduplicator.total:
+        print('Classified %i distinct texts for %i tweets, %i classifications avoided (%.1f%%)'
+              % (deduplicator.classified, deduplicator.total, deduplicator.avoided(),
+                 deduplicator.avoided() * 100 / deduplicator.total))
+    if local:
+        if jobs <= 1:
+            print('Stem cache hit rate: %.1f%%' % (classifier.stem_cache.hit_rate() * 100))
+        # keep the stems computed in this run for the next ones; with --jobs they stay in the workers
+        if classifier.stem_cache.misses > stems_before:
+            classifier.save_model()
+
+    sys.stdout.write('All done. File written to ' + outfile)
 
 
 def main() -> None:
     args = add_args()
-    predict(args.infile, args.outfile)
+    backends = tuple(args.backends.split(',')) if args.backends else None
+    predict(args.infile, args.outfile, args.retrain, args.batchsize, args.jobs, not args.noserver, args.compact,
+            args.online, backends, args.dedup, args.sidecar, args.scores, args.resume, args.checkpointinterval)
 
 
 if __name__ == "__main__":
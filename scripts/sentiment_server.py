@@ -0,0 +1,113 @@
+#
+# Local Sentiment Inference Server
+#
+# Keeps the sentiment model loaded between runs. While it is running, sentiment_analysis.py (and so the GUI)
+# sends its batches here instead of importing scikit-learn and loading the model in a fresh interpreter.
+#
+
+import os
+import sys
+import json
+import argparse
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.modules.sentiment_client import SentimentClient, SERVER_FILE
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Serves sentiment classification over localhost HTTP.')
+    parser.add_argument('-p', '--port', metavar='', type=int, default=8765,
+                        help='Port to listen on (localhost only). Default is 8765')
+    parser.add_argument('-s', '--stop', action='store_true', help='Stop the running server and exit')
+    return parser.parse_args()
+
+
+class SentimentRequestHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, payload) -> None:
+        body = json.dumps(payload).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf8')) if length else {}
+        except ValueError:
+            self.send_json(400, {'error': 'invalid JSON'})
+            return
+
+        if self.path == '/classify':
+            texts = payload.get('texts')
+            if not isinstance(texts, list):
+                self.send_json(400, {'error': "'texts' must be a list of strings"})
+                return
+            sentiments = self.server.classifier.predict_batch([str(text) for text in texts])
+            self.send_json(200, {'sentiments': [sentiment.value for sentiment in sentiments]})
+
+        elif self.path == '/shutdown':
+            self.send_json(200, {'status': 'stopping'})
+            threading.Thread(target=self.server.shutdown).start()
+
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def log_message(self, format, *args) -> None:
+        # one line per batch would flood the console
+        pass
+
+
+def serve(port) -> None:
+    from scripts.modules.sentiment_classifier import SentimentClassifier
+
+    print('Loading model...')
+    server = HTTPServer(('127.0.0.1', port), SentimentRequestHandler)
+    server.classifier = SentimentClassifier()
+
+    os.makedirs(os.path.dirname(SERVER_FILE), exist_ok=True)
+    with open(SERVER_FILE, 'w', encoding='utf8') as f:
+        json.dump({'host': '127.0.0.1', 'port': server.server_address[1], 'pid': os.getpid()}, f)
+
+    print('Serving sentiment classification on http://127.0.0.1:%i' % server.server_address[1])
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(SERVER_FILE):
+            os.remove(SERVER_FILE)
+        # keep the stems computed while serving for the next runs
+        server.classifier.save_model()
+        print('Server stopped.')
+
+
+def main() -> None:
+    args = add_args()
+    if args.stop:
+        client = SentimentClient.connect()
+        if client is None:
+            print('No sentiment server is running.')
+        else:
+            client.shutdown()
+            print('Sentiment server stopped.')
+        return
+
+    serve(args.port)
+
+
+if __name__ == "__main__":
+    main()
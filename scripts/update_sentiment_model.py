@@ -0,0 +1,66 @@
+#
+# Incremental Sentiment Model Update
+#
+# Updates the online sentiment model (sentiment_analysis.py -on) with tweets labelled in a JSONL file, one
+# {"text": ..., "emotion": "positive" | "neutral" | "negative"} object per line. Only the lines appended since the
+# last update are read, and every update is saved as a new model version.
+#
+
+import os
+import sys
+import time
+import argparse
+
+# the repository root has to be importable before 'scripts.modules'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.modules.online_classifier import OnlineSentimentClassifier
+
+
+def add_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Updates the online sentiment model with newly labelled tweets.')
+    parser.add_argument('-l', '--labels', metavar='', default=None,
+                        help='JSONL file of labelled tweets. Lines already used by earlier updates are skipped')
+    parser.add_argument('-b', '--batchsize', metavar='', type=int, default=1000,
+                        help='Number of tweets per partial_fit call. Default is 1000')
+    parser.add_argument('-v', '--version', metavar='', type=int, default=None,
+                        help='Version to update. Default is the latest')
+    parser.add_argument('-ls', '--list', action='store_true', help='List the saved versions and exit')
+    return parser.parse_args()
+
+
+def list_versions(classifier) -> None:
+    store = classifier.model_store
+    for version in store.versions():
+        loaded = store.load_version(classifier.fingerprint, version)
+        if loaded is None:
+            print('v%i: derived from another dataset' % version)
+        else:
+            info = loaded[1]
+            print('v%i: %i labelled tweets, saved %s' % (version, info['examples'], info.get('saved', '?')))
+
+
+def main() -> None:
+    args = add_args()
+
+    print('Loading model...')
+    classifier = OnlineSentimentClassifier(version=args.version)
+    if args.list:
+        list_versions(classifier)
+        return
+    if args.labels is None:
+        sys.stdout.write('A labels file is required (-l)\nQuitting...')
+        return
+
+    start = time.perf_counter()
+    count = classifier.update_from_file(args.labels, args.batchsize)
+    if count == 0:
+        print('No new labelled tweets in %s' % args.labels)
+        return
+
+    version = classifier.save_version()
+    print('Updated with %i tweets in %.2fs, saved as version %i' % (count, time.perf_counter() - start, version))
+
+
+if __name__ == "__main__":
+    main()
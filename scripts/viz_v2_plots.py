@@ -1,9 +1,13 @@
+import os
 import ijson
 import requests
 from operator import itemgetter
 from datetime import datetime, timedelta
 from sanitize_tweets import sanitize
-from quick_report import report
+from quick_report import report, STOPWORDS_FILES
+from modules.report_cache import ReportCache
+from modules.loader import Loader
+from modules.sidecar import sidecar_path
 
 
 # def add_args():
@@ -41,37 +45,46 @@ def getValuesLineplot(filename):
     return ex, ey
 
 
-def getValueSentimentLineplot(filename, sentiment) -> (list[str], list[int]):
-    with open(filename, 'r', encoding='utf8') as f:
-        objects = ijson.items(f, 'item')
-        data = list(objects)
+def hasEmotion(filename) -> bool:
+    tweets = Loader().stream_file(filename)
+    first = next(tweets, None)
+    tweets.close()
+    return first is not None and 'emotion' in first
 
-        if 'emotion' not in data[0]:
-            raise RuntimeError('Emotion not found in file.')
 
-        times = []
-        for i in range(len(data) - 1, -1, -1):
-            times.append((datetime.strptime(data[i]['created_at'], '%Y-%m-%dT%H:%M:%SZ'), data[i]['emotion']))
+def getValueSentimentLineplot(filename, sentiment, sidecar=None) -> (list[str], list[int]):
+    # labels come from the tweets themselves or from a .sentiment sidecar file (sentiment_analysis.py -sc),
+    # joined while the tweets stream by; only the timestamp and label of each tweet are kept. The sidecar next to
+    # the file is only picked up when the tweets have no labels of their own
+    if sidecar is None and os.path.exists(sidecar_path(filename)) and not hasEmotion(filename):
+        sidecar = sidecar_path(filename)
 
-        xs = []
-        ys = []
+    times = []
+    for tweet in Loader().stream_file(filename, sidecar):
+        if not times and 'emotion' not in tweet:
+            raise RuntimeError('Emotion not found in file.')
+        times.append((datetime.strptime(tweet['created_at'], '%Y-%m-%dT%H:%M:%SZ'), tweet.get('emotion')))
+    times.reverse()
+
+    xs = []
+    ys = []
 
-        count = 0
-        started_time = times[0][0]
-        started_time += timedelta(seconds=1)
-        for i in range(len(times)):
-            if times[i][0] >= started_time:
-                ys.append(count)
-                started_time = times[i][0]
-                xs.append(datetime.strftime(started_time, '%Y-%m-%dT%H:%M:%SZ'))
-                started_time += timedelta(seconds=1)
-                count = 1
+    count = 0
+    started_time = times[0][0]
+    started_time += timedelta(seconds=1)
+    for i in range(len(times)):
+        if times[i][0] >= started_time:
+            ys.append(count)
+            started_time = times[i][0]
+            xs.append(datetime.strftime(started_time, '%Y-%m-%dT%H:%M:%SZ'))
+            started_time += timedelta(seconds=1)
+            count = 1
 
-            elif times[i][1] == sentiment:
-                count += 1
+        elif times[i][1] == sentiment:
+            count += 1
 
-        print('Lineplot of ' + sentiment + ' sentiment created.')
-        return xs, ys
+    print('Lineplot of ' + sentiment + ' sentiment created.')
+    return xs, ys
 
 
 def getValuesHeatmap(filename):
@@ -185,14 +198,28 @@ def getValuesHeatmapMinute(filename):
 
 def getValuesWordcloud(filename):
     if ".json" in filename:
-        print('JSON passado como parametro. Iniciando sanitize e gerando quick reports automatico...')
-        sanitize(filename, 'sanitize_auto_aux.json', ['./scripts/stopwords/stopwords_en.txt'], True, True)
-        report('sanitize_auto_aux.json', 'quick_sanitize_auto_aux.txt', 10)
-        filename = 'quick_sanitize_auto_aux.txt'
-
-    arq = open(filename, 'r', encoding='utf8')
-    linhas = arq.read().splitlines()
-    arq.close()
+        sanitize_stopwords = ['./scripts/stopwords/stopwords_en.txt']
+        cache = ReportCache()
+        key = cache.make_key(filename, sanitize_stopwords + STOPWORDS_FILES, displaycount=10, mode='wordcloud')
+        summary = cache.get(key)
+
+        if summary is None:
+            print('JSON passado como parametro. Iniciando sanitize e gerando quick reports automatico...')
+            sanitize(filename, 'sanitize_auto_aux.json', sanitize_stopwords, True, True)
+            report('sanitize_auto_aux.json', 'quick_sanitize_auto_aux.txt', 10)
+            with open('quick_sanitize_auto_aux.txt', 'r', encoding='utf8') as arq:
+                summary = arq.read()
+            cache.put(key, summary)
+
+        else:
+            print('Quick report automatico encontrado no cache.')
+
+        linhas = summary.splitlines()
+
+    else:
+        arq = open(filename, 'r', encoding='utf8')
+        linhas = arq.read().splitlines()
+        arq.close()
 
     index_inicio = linhas.index('Word ranking:') + 2
     d = []
@@ -743,6 +743,9 @@ class Ui_StackedWidget(object):
             * Input: Filename for the input JSON.
 
             * Output: Filename for the resulting output. The default is "output_sentiments.json".
+
+            * Tip: keep "python scripts/sentiment_server.py" running to reuse
+            the loaded model and skip the startup of each run.
         """)
 
         self.sentiment_analysis_input.addItems(self.showFilesInput())